@@ -0,0 +1,106 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import tempfile
+from dotenv import load_dotenv
+from app.database.qdrant_client import QdrantManager
+from app.services.openai_service import OpenAIService
+from app.services.pdf_renderers import benchmark_renderer, create_renderer
+
+async def _compact_sessions(args: argparse.Namespace):
+    qdrant_manager = QdrantManager()
+    try:
+        stats = await qdrant_manager.compact_session_points(batch_size=args.batch_size, dry_run=args.dry_run)
+        print(json.dumps(stats, indent=2))
+    finally:
+        await qdrant_manager.close()
+
+async def _split_collections(args: argparse.Namespace):
+    qdrant_manager = QdrantManager()
+    openai_service = OpenAIService()
+    try:
+        copied = await qdrant_manager.migrate_to_split_collections(openai_service, batch_size=args.batch_size)
+        print(json.dumps(copied, indent=2))
+    finally:
+        await qdrant_manager.close()
+        await openai_service.close()
+
+async def _update_storage(args: argparse.Namespace):
+    qdrant_manager = QdrantManager()
+    try:
+        applied = await qdrant_manager.apply_storage_config(dry_run=args.dry_run)
+        print(json.dumps(applied, indent=2))
+    finally:
+        await qdrant_manager.close()
+
+async def _reembed(args: argparse.Namespace):
+    qdrant_manager = QdrantManager()
+    openai_service = OpenAIService()
+    try:
+        reembedded = await qdrant_manager.reembed(openai_service, args.target, batch_size=args.batch_size)
+        print(json.dumps(reembedded, indent=2))
+    finally:
+        await qdrant_manager.close()
+        await openai_service.close()
+
+async def _bench_pdf(args: argparse.Namespace):
+    results = []
+    with tempfile.TemporaryDirectory() as output_dir:
+        for name in args.renderer or ["pdfkit", "fpdf"]:
+            try:
+                renderer = create_renderer(name)
+                results.append(await asyncio.to_thread(benchmark_renderer, renderer, args.count, args.workers, output_dir))
+            except Exception as e:
+                results.append({"renderer": name, "error": str(e)})
+    print(json.dumps(results, indent=2))
+
+async def _ensure_indexes(args: argparse.Namespace):
+    qdrant_manager = QdrantManager()
+    openai_service = OpenAIService()
+    try:
+        await qdrant_manager.initialize(openai_service)
+    finally:
+        await qdrant_manager.close()
+        await openai_service.close()
+
+def main():
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+    
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="AI Membership Enrollment maintenance commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    compact = subparsers.add_parser("compact-sessions", help="Collapse duplicate session, ticket and summary points")
+    compact.add_argument("--batch-size", type=int, default=256)
+    compact.add_argument("--dry-run", action="store_true")
+    compact.set_defaults(handler=_compact_sessions)
+    
+    indexes = subparsers.add_parser("ensure-indexes", help="Create missing collections and payload indexes")
+    indexes.set_defaults(handler=_ensure_indexes)
+    
+    split = subparsers.add_parser("split-collections", help="Copy the shared collection into per-type collections")
+    split.add_argument("--batch-size", type=int, default=256)
+    split.set_defaults(handler=_split_collections)
+    
+    storage = subparsers.add_parser("update-storage", help="Apply quantization, on-disk and HNSW settings to existing collections")
+    storage.add_argument("--dry-run", action="store_true")
+    storage.set_defaults(handler=_update_storage)
+    
+    reembed = subparsers.add_parser("reembed", help="Rebuild all vectors with the configured embedding model into new collections")
+    reembed.add_argument("--target", required=True, help="Base name of the collection(s) to write, e.g. enrollment_data_v2")
+    reembed.add_argument("--batch-size", type=int, default=128)
+    reembed.set_defaults(handler=_reembed)
+    
+    bench_pdf = subparsers.add_parser("bench-pdf", help="Compare per-document latency and throughput of the PDF renderers")
+    bench_pdf.add_argument("--renderer", action="append", choices=["pdfkit", "fpdf"], help="Repeat to select several; default: all")
+    bench_pdf.add_argument("--count", type=int, default=50)
+    bench_pdf.add_argument("--workers", type=int, default=int(os.getenv("PDF_RENDER_WORKERS", "2")))
+    bench_pdf.set_defaults(handler=_bench_pdf)
+    
+    args = parser.parse_args()
+    asyncio.run(args.handler(args))
+
+if __name__ == "__main__":
+    main()
@@ -1,44 +1,294 @@
-from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct, Filter, FieldCondition, MatchValue
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.models import Distance, VectorParams, PointStruct, Filter, FieldCondition, MatchValue, MatchAny, MatchText, PointIdsList, PayloadSchemaType, PointVectors, OrderBy, Direction, HasIdCondition, SearchParams, SearchRequest, TextIndexParams, TokenizerType, DatetimeRange
+from qdrant_client.models import VectorParamsDiff, HnswConfigDiff, ScalarQuantization, ScalarQuantizationConfig, ScalarType, BinaryQuantization, BinaryQuantizationConfig, Disabled, QuantizationSearchParams
+import asyncio
+import base64
+import httpx
 import os
 import uuid
 import json
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple, AsyncIterator
 import logging
+import time
 from datetime import datetime
+from app.database.session_cache import SessionCache
+
+POINT_ID_NAMESPACE = uuid.UUID("6f1c1a52-3b0e-4d7e-9a55-3c7c2f0e8b41")
+
+COLLECTION_SUFFIXES = {
+    "session": "sessions",
+    "ticket": "tickets",
+    "summary": "summaries",
+    "zendesk_ticket": "zendesk_tickets",
+    "question": "questions"
+}
+
+PAYLOAD_INDEXES = {
+    "session": {
+        "session_id": PayloadSchemaType.KEYWORD,
+        "user_id": PayloadSchemaType.KEYWORD,
+        "data.is_complete": PayloadSchemaType.BOOL,
+        "updated_at": PayloadSchemaType.DATETIME
+    },
+    "ticket": {"session_id": PayloadSchemaType.KEYWORD, "ticket_id": PayloadSchemaType.KEYWORD, "category": PayloadSchemaType.KEYWORD},
+    "summary": {"session_id": PayloadSchemaType.KEYWORD},
+    "zendesk_ticket": {
+        "ticket_id": PayloadSchemaType.KEYWORD,
+        "data.status": PayloadSchemaType.KEYWORD,
+        "data.priority": PayloadSchemaType.KEYWORD,
+        "data.tags": PayloadSchemaType.KEYWORD,
+        "data.created_at": PayloadSchemaType.DATETIME,
+        "data.updated_at": PayloadSchemaType.DATETIME,
+        "data.subject": TextIndexParams(type="text", tokenizer=TokenizerType.WORD, min_token_len=2, lowercase=True),
+        "data.description": TextIndexParams(type="text", tokenizer=TokenizerType.WORD, min_token_len=2, lowercase=True)
+    },
+    "question": {"category": PayloadSchemaType.KEYWORD}
+}
+
+ZENDESK_TEXT_FIELDS = ["data.subject", "data.description"]
+ZENDESK_SORT_FIELDS = {"created_at": "data.created_at", "updated_at": "data.updated_at"}
+
+def encode_cursor(cursor: Dict[str, Any]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(cursor, separators=(",", ":")).encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        decoded = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, UnicodeError) as e:
+        raise ValueError("Invalid page cursor") from e
+    if not isinstance(decoded, dict):
+        raise ValueError("Invalid page cursor")
+    return decoded
+
+def embedding_text(point_type: str, payload: Dict[str, Any]) -> Optional[str]:
+    """The text each point type's vector was computed from, for rebuilding vectors."""
+    if point_type == "session":
+        user_messages = [message.get("content") for message in payload.get("data", {}).get("messages", []) if message.get("role") == "user"]
+        return user_messages[-1] if user_messages else None
+    if point_type == "ticket":
+        ticket_data = payload.get("ticket_data", {})
+        return f"{ticket_data.get('subject', '')} {ticket_data.get('description', '')}"
+    if point_type == "summary":
+        return payload.get("summary_text")
+    if point_type == "zendesk_ticket":
+        ticket_data = payload.get("data", {})
+        return f"{ticket_data.get('subject', '')} {ticket_data.get('description', '')}"
+    if point_type == "question":
+        return payload.get("text")
+    return None
 
 class QdrantManager:
     def __init__(self):
         self.host = os.getenv("QDRANT_HOST", "localhost")
         self.port = int(os.getenv("QDRANT_PORT", "6333"))
-        self.client = QdrantClient(host=self.host, port=self.port)
-        self.collection_name = "enrollment_data"
+        self.grpc_port = int(os.getenv("QDRANT_GRPC_PORT", "6334"))
+        self.prefer_grpc = os.getenv("QDRANT_PREFER_GRPC", "false").lower() == "true"
+        self.timeout = int(os.getenv("QDRANT_TIMEOUT", "10"))
+        self.pool_size = int(os.getenv("QDRANT_POOL_SIZE", "100"))
+        self.pool_keepalive = int(os.getenv("QDRANT_POOL_KEEPALIVE", "20"))
+        self.client = AsyncQdrantClient(
+            host=self.host,
+            port=self.port,
+            grpc_port=self.grpc_port,
+            prefer_grpc=self.prefer_grpc,
+            timeout=self.timeout,
+            limits=httpx.Limits(
+                max_connections=self.pool_size,
+                max_keepalive_connections=self.pool_keepalive
+            )
+        )
+        self.collection_name = os.getenv("QDRANT_COLLECTION", "enrollment_data")
+        self.vector_size = int(os.getenv("EMBEDDING_DIMENSIONS", "1536"))
+        self.split_collections = os.getenv("QDRANT_SPLIT_COLLECTIONS", "false").lower() == "true"
+        self.session_cache = SessionCache.from_env()
+        self.count_exact = os.getenv("ZENDESK_COUNT_EXACT", "false").lower() == "true"
+        self.count_cache_ttl = float(os.getenv("ZENDESK_COUNT_CACHE_TTL", "30"))
+        self._count_cache: Dict[str, Tuple[float, int]] = {}
+        self.storage_config = {
+            collection_name: self._storage_config(collection_name, point_types)
+            for collection_name, point_types in self.collection_layout().items()
+        }
         
-    async def initialize(self):
+    async def initialize(self, openai_service=None):
         try:
-            collections = self.client.get_collections()
-            collection_exists = any(col.name == self.collection_name for col in collections.collections)
+            collections = await self.client.get_collections()
+            existing_collections = {col.name for col in collections.collections}
             
-            if not collection_exists:
-                self.client.create_collection(
-                    collection_name=self.collection_name,
-                    vectors_config=VectorParams(size=1536, distance=Distance.COSINE),
-                )
-                logging.info(f"Created collection: {self.collection_name}")
-                
-                openai_api_key = os.getenv("OPENAI_API_KEY")
-                if openai_api_key and openai_api_key != "your_openai_api_key_here":
-                    await self._initialize_sample_data()
+            for collection_name, point_types in self.collection_layout().items():
+                if collection_name not in existing_collections:
+                    config = self.storage_config[collection_name]
+                    await self.client.create_collection(
+                        collection_name=collection_name,
+                        vectors_config=VectorParams(size=self.vector_size, distance=Distance.COSINE, on_disk=config["on_disk"]),
+                        hnsw_config=self._hnsw_config(config),
+                        quantization_config=self._quantization_config(config)
+                    )
+                    logging.info(f"Created collection: {collection_name}")
+                else:
+                    logging.info(f"Collection {collection_name} already exists")
+                    await self._check_vector_size(collection_name)
+                await self._ensure_payload_indexes(collection_name, point_types)
+            
+            if self.collection_for("question") not in existing_collections:
+                if openai_service is not None:
+                    await self._initialize_sample_data(openai_service)
                 else:
-                    logging.warning("OpenAI API key not configured - skipping sample data initialization")
+                    logging.warning("No embedding service provided - initializing sample data without embeddings")
                     await self._initialize_sample_data_without_embeddings()
-            else:
-                logging.info(f"Collection {self.collection_name} already exists")
         except Exception as e:
             logging.error(f"Failed to initialize Qdrant: {str(e)}")
             raise
     
-    async def _initialize_sample_data(self):
+    async def close(self):
+        await self.session_cache.close()
+        await self.client.close()
+    
+    def point_id(self, point_type: str, key: str) -> str:
+        return str(uuid.uuid5(POINT_ID_NAMESPACE, f"{point_type}:{key}"))
+    
+    def collection_for(self, point_type: str) -> str:
+        if self.split_collections:
+            return f"{self.collection_name}_{COLLECTION_SUFFIXES[point_type]}"
+        return self.collection_name
+    
+    def collection_layout(self) -> Dict[str, List[str]]:
+        layout: Dict[str, List[str]] = {}
+        for point_type in COLLECTION_SUFFIXES:
+            layout.setdefault(self.collection_for(point_type), []).append(point_type)
+        return layout
+    
+    def _type_conditions(self, point_type: str) -> List[FieldCondition]:
+        # A per-type collection only ever holds one type, so the filter is redundant there.
+        if self.split_collections:
+            return []
+        return [FieldCondition(key="type", match=MatchValue(value=point_type))]
+    
+    def _type_filter(self, point_type: str) -> Optional[Filter]:
+        conditions = self._type_conditions(point_type)
+        return Filter(must=conditions) if conditions else None
+    
+    async def _check_vector_size(self, collection_name: str):
+        collection_info = await self.client.get_collection(collection_name=collection_name)
+        vector_size = collection_info.config.params.vectors.size
+        if vector_size != self.vector_size:
+            raise ValueError(
+                f"Collection {collection_name} stores {vector_size}-dimensional vectors but EMBEDDING_DIMENSIONS is "
+                f"{self.vector_size}; re-embed into a new collection with `python -m app.cli reembed`"
+            )
+    
+    def _storage_config(self, collection_name: str, point_types: List[str]) -> Dict[str, Any]:
+        """Vector storage settings from QDRANT_<SETTING>, overridable per split collection.
+        
+        e.g. QDRANT_QUANTIZATION=scalar applies everywhere, while
+        QDRANT_ZENDESK_TICKETS_QUANTIZATION=binary only affects enrollment_data_zendesk_tickets.
+        """
+        def setting(name: str, default: Optional[str] = None) -> Optional[str]:
+            if collection_name != self.collection_name:
+                scoped = os.getenv(f"QDRANT_{collection_name[len(self.collection_name) + 1:].upper()}_{name}")
+                if scoped:
+                    return scoped
+            return os.getenv(f"QDRANT_{name}") or default
+        
+        # Session and summary vectors are written every turn but never searched on the
+        # hot path, so their own collections keep originals on disk unless told otherwise.
+        default_on_disk = all(point_type in ("session", "summary") for point_type in point_types)
+        quantization = setting("QUANTIZATION", "none").lower()
+        if quantization not in ("none", "scalar", "binary"):
+            raise ValueError(f"Unsupported quantization for {collection_name}: {quantization}")
+        hnsw_m = setting("HNSW_M")
+        hnsw_ef_construct = setting("HNSW_EF_CONSTRUCT")
+        return {
+            "on_disk": setting("VECTORS_ON_DISK", str(default_on_disk)).lower() == "true",
+            "quantization": quantization,
+            "always_ram": setting("QUANTIZATION_ALWAYS_RAM", "true").lower() == "true",
+            "rescore": setting("QUANTIZATION_RESCORE", "true").lower() == "true",
+            "oversampling": float(setting("QUANTIZATION_OVERSAMPLING", "2.0")),
+            "hnsw_m": int(hnsw_m) if hnsw_m else None,
+            "hnsw_ef_construct": int(hnsw_ef_construct) if hnsw_ef_construct else None
+        }
+    
+    def _hnsw_config(self, config: Dict[str, Any]) -> Optional[HnswConfigDiff]:
+        if config["hnsw_m"] is None and config["hnsw_ef_construct"] is None:
+            return None
+        return HnswConfigDiff(m=config["hnsw_m"], ef_construct=config["hnsw_ef_construct"])
+    
+    def _quantization_config(self, config: Dict[str, Any]):
+        if config["quantization"] == "scalar":
+            return ScalarQuantization(
+                scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=0.99, always_ram=config["always_ram"])
+            )
+        if config["quantization"] == "binary":
+            return BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=config["always_ram"]))
+        return None
+    
+    def _search_params(self, collection_name: str, hnsw_ef: Optional[int] = None) -> Optional[SearchParams]:
+        # Quantized collections search the compressed vectors first, then rescore the
+        # oversampled candidates against the originals so ranking quality holds.
+        config = self.storage_config[collection_name]
+        quantization = None
+        if config["quantization"] != "none":
+            quantization = QuantizationSearchParams(rescore=config["rescore"], oversampling=config["oversampling"])
+        if hnsw_ef is None and quantization is None:
+            return None
+        return SearchParams(hnsw_ef=hnsw_ef, quantization=quantization)
+    
+    async def apply_storage_config(self, dry_run: bool = False) -> Dict[str, Dict[str, Any]]:
+        """Bring existing collections in line with the configured storage settings.
+        
+        Qdrant rebuilds the affected segments in the background, so the collection stays
+        searchable while the optimizer converts vectors to disk or builds quantized copies.
+        """
+        collections = await self.client.get_collections()
+        existing_collections = {col.name for col in collections.collections}
+        applied = {}
+        for collection_name, config in self.storage_config.items():
+            if collection_name not in existing_collections:
+                continue
+            applied[collection_name] = config
+            if dry_run:
+                continue
+            await self.client.update_collection(
+                collection_name=collection_name,
+                vectors_config={"": VectorParamsDiff(on_disk=config["on_disk"])},
+                hnsw_config=self._hnsw_config(config),
+                quantization_config=self._quantization_config(config) or Disabled.DISABLED
+            )
+            logging.info(f"Updated storage settings for {collection_name}: {config}")
+        return applied
+    
+    async def _ensure_payload_indexes(self, collection_name: str, point_types: List[str]):
+        indexes: Dict[str, PayloadSchemaType] = {}
+        if len(point_types) > 1:
+            indexes["type"] = PayloadSchemaType.KEYWORD
+        for point_type in point_types:
+            indexes.update(PAYLOAD_INDEXES[point_type])
+        
+        collection_info = await self.client.get_collection(collection_name=collection_name)
+        existing_indexes = collection_info.payload_schema or {}
+        for field_name, field_schema in indexes.items():
+            if field_name in existing_indexes:
+                continue
+            await self.client.create_payload_index(
+                collection_name=collection_name,
+                field_name=field_name,
+                field_schema=field_schema,
+                wait=True
+            )
+            logging.info(f"Created payload index {collection_name}.{field_name}")
+    
+    async def _retrieve_payload(self, point_type: str, key: str) -> Optional[Dict[str, Any]]:
+        points = await self.client.retrieve(
+            collection_name=self.collection_for(point_type),
+            ids=[self.point_id(point_type, key)],
+            with_payload=True,
+            with_vectors=False
+        )
+        if points:
+            return points[0].payload
+        return None
+    
+    async def _initialize_sample_data(self, openai_service=None):
         sample_questions = [
             "What is your full name?",
             "What is your email address?",
@@ -48,14 +298,16 @@ class QdrantManager:
             "How did you hear about our program?"
         ]
         
-        from app.services.openai_service import OpenAIService
-        openai_service = OpenAIService()
+        if openai_service is None:
+            from app.services.openai_service import OpenAIService
+            openai_service = OpenAIService()
+        
+        embeddings = await openai_service.get_embeddings_batch(sample_questions)
         
         points = []
-        for i, question in enumerate(sample_questions):
-            embedding = await openai_service.get_embedding(question)
+        for question, embedding in zip(sample_questions, embeddings):
             point = PointStruct(
-                id=str(uuid.uuid4()),
+                id=self.point_id("question", question),
                 vector=embedding,
                 payload={
                     "type": "question",
@@ -66,7 +318,7 @@ class QdrantManager:
             )
             points.append(point)
         
-        self.client.upsert(collection_name=self.collection_name, points=points)
+        await self.client.upsert(collection_name=self.collection_for("question"), points=points)
         logging.info("Initialized sample questions in Qdrant")
     
     async def _initialize_sample_data_without_embeddings(self):
@@ -82,9 +334,9 @@ class QdrantManager:
         
         points = []
         for i, question in enumerate(sample_questions):
-            dummy_embedding = [0.0] * 1536
+            dummy_embedding = self.placeholder_vector()
             point = PointStruct(
-                id=str(uuid.uuid4()),
+                id=self.point_id("question", question),
                 vector=dummy_embedding,
                 payload={
                     "type": "question",
@@ -95,77 +347,136 @@ class QdrantManager:
             )
             points.append(point)
         
-        self.client.upsert(collection_name=self.collection_name, points=points)
+        await self.client.upsert(collection_name=self.collection_for("question"), points=points)
         logging.info("Initialized sample questions in Qdrant with dummy embeddings")
     
-    async def store_session_data(self, session_id: str, user_id: str, data: Dict[str, Any], embedding: List[float]):
+    def placeholder_vector(self) -> List[float]:
+        return [0.0] * self.vector_size
+    
+    async def store_session_data(self, session_id: str, user_id: str, data: Dict[str, Any], embedding: Optional[List[float]] = None):
+        # Without an embedding the point is stored with a placeholder vector that
+        # EmbeddingQueue patches in later via update_vectors.
+        now = datetime.utcnow().isoformat()
         point = PointStruct(
-            id=str(uuid.uuid4()),
-            vector=embedding,
+            id=self.point_id("session", session_id),
+            vector=embedding if embedding is not None else self.placeholder_vector(),
             payload={
                 "type": "session",
                 "session_id": session_id,
                 "user_id": user_id,
                 "data": data,
-                "created_at": datetime.utcnow().isoformat()
+                "created_at": data.get("created_at") or now,
+                "updated_at": now
             }
         )
-        self.client.upsert(collection_name=self.collection_name, points=[point])
+        await self.client.upsert(collection_name=self.collection_for("session"), points=[point])
+        await self.session_cache.set(session_id, data)
     
     async def store_ticket_data(self, session_id: str, ticket_data: Dict[str, Any], embedding: List[float]):
         point = PointStruct(
-            id=str(uuid.uuid4()),
+            id=self.point_id("ticket", session_id),
             vector=embedding,
             payload={
                 "type": "ticket",
                 "session_id": session_id,
+                "ticket_id": ticket_data.get("ticket_id"),
+                "category": ticket_data.get("category"),
                 "ticket_data": ticket_data,
                 "created_at": datetime.utcnow().isoformat()
             }
         )
-        self.client.upsert(collection_name=self.collection_name, points=[point])
+        await self.client.upsert(collection_name=self.collection_for("ticket"), points=[point])
     
-    async def store_summary_data(self, session_id: str, summary_text: str, embedding: List[float]):
+    async def store_summary_data(self, session_id: str, summary_text: str, embedding: List[float], content_hash: Optional[str] = None):
         point = PointStruct(
-            id=str(uuid.uuid4()),
+            id=self.point_id("summary", session_id),
             vector=embedding,
             payload={
                 "type": "summary",
                 "session_id": session_id,
                 "summary_text": summary_text,
+                "content_hash": content_hash,
                 "created_at": datetime.utcnow().isoformat()
             }
         )
-        self.client.upsert(collection_name=self.collection_name, points=[point])
+        await self.client.upsert(collection_name=self.collection_for("summary"), points=[point])
     
-    async def store_zendesk_ticket(self, ticket_id: str, ticket_data: Dict[str, Any], embedding: List[float]):
-        point = PointStruct(
-            id=str(uuid.uuid4()),
-            vector=embedding,
-            payload={
-                "type": "zendesk_ticket",
-                "ticket_id": ticket_id,
-                "data": ticket_data,
-                "created_at": datetime.utcnow().isoformat()
-            }
+    async def get_summary_content_hash(self, session_id: str) -> Optional[str]:
+        points = await self.client.retrieve(
+            collection_name=self.collection_for("summary"),
+            ids=[self.point_id("summary", session_id)],
+            with_payload=["content_hash"],
+            with_vectors=False
         )
-        self.client.upsert(collection_name=self.collection_name, points=[point])
+        return points[0].payload.get("content_hash") if points else None
+    
+    async def store_zendesk_tickets(self, tickets: List[Tuple[str, Dict[str, Any], List[float], Optional[str]]]):
+        now = datetime.utcnow().isoformat()
+        points = [
+            PointStruct(
+                id=self.point_id("zendesk_ticket", ticket_id),
+                vector=embedding,
+                payload={
+                    "type": "zendesk_ticket",
+                    "ticket_id": ticket_id,
+                    "content_hash": content_hash,
+                    "data": ticket_data,
+                    "created_at": now
+                }
+            )
+            for ticket_id, ticket_data, embedding, content_hash in tickets
+        ]
+        await self.client.upsert(collection_name=self.collection_for("zendesk_ticket"), points=points)
+        self._count_cache.clear()
+    
+    async def get_zendesk_content_hashes(self, ticket_ids: List[str]) -> Dict[str, str]:
+        points = await self.client.retrieve(
+            collection_name=self.collection_for("zendesk_ticket"),
+            ids=[self.point_id("zendesk_ticket", ticket_id) for ticket_id in ticket_ids],
+            with_payload=["ticket_id", "content_hash"],
+            with_vectors=False
+        )
+        return {
+            point.payload["ticket_id"]: point.payload["content_hash"]
+            for point in points
+            if point.payload.get("content_hash")
+        }
+    
+    async def update_vectors(self, point_type: str, vectors: Dict[str, List[float]]):
+        await self.client.update_vectors(
+            collection_name=self.collection_for(point_type),
+            points=[
+                PointVectors(id=self.point_id(point_type, key), vector=vector)
+                for key, vector in vectors.items()
+            ],
+            wait=False
+        )
+    
+    async def _session_is_current(self, session_id: str, cached: Dict[str, Any]) -> bool:
+        # A per-process cache misses writes made by other workers (e.g. gunicorn -w 4); serving
+        # it would let this worker write an older state back over the newer one. Compare the
+        # cached updated_at with the stored one, which only reads that single field.
+        points = await self.client.retrieve(
+            collection_name=self.collection_for("session"),
+            ids=[self.point_id("session", session_id)],
+            with_payload=["data.updated_at"],
+            with_vectors=False
+        )
+        stored = points[0].payload.get("data", {}).get("updated_at") if points else None
+        return cached.get("updated_at") is not None and cached.get("updated_at") == stored
     
     async def get_session_data(self, session_id: str) -> Optional[Dict[str, Any]]:
         try:
-            results = self.client.scroll(
-                collection_name=self.collection_name,
-                scroll_filter=Filter(
-                    must=[
-                        FieldCondition(key="type", match=MatchValue(value="session")),
-                        FieldCondition(key="session_id", match=MatchValue(value=session_id))
-                    ]
-                ),
-                limit=1
+            cached = await self.session_cache.get(
+                session_id, lambda value: self._session_is_current(session_id, value)
             )
+            if cached is not None:
+                return cached
             
-            if results[0]:
-                return results[0][0].payload.get("data")
+            payload = await self._retrieve_payload("session", session_id)
+            if payload and payload.get("data"):
+                await self.session_cache.set(session_id, payload["data"])
+                return payload["data"]
             return None
         except Exception as e:
             logging.error(f"Error retrieving session data: {str(e)}")
@@ -173,59 +484,458 @@ class QdrantManager:
     
     async def get_ticket_data(self, session_id: str) -> Optional[Dict[str, Any]]:
         try:
-            results = self.client.scroll(
-                collection_name=self.collection_name,
-                scroll_filter=Filter(
-                    must=[
-                        FieldCondition(key="type", match=MatchValue(value="ticket")),
-                        FieldCondition(key="session_id", match=MatchValue(value=session_id))
-                    ]
-                ),
-                limit=1
-            )
-            
-            if results[0]:
-                return results[0][0].payload.get("ticket_data")
+            payload = await self._retrieve_payload("ticket", session_id)
+            if payload:
+                return payload.get("ticket_data")
             return None
         except Exception as e:
             logging.error(f"Error retrieving ticket data: {str(e)}")
             return None
     
-    async def get_zendesk_tickets(self, limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
+    async def iter_completed_sessions(self, since: Optional[datetime] = None, until: Optional[datetime] = None, batch_size: int = 64) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Yield pages of completed sessions' data, optionally limited to those last
+        updated in [since, until)."""
+        conditions = self._type_conditions("session")
+        conditions.append(FieldCondition(key="data.is_complete", match=MatchValue(value=True)))
+        if since or until:
+            conditions.append(FieldCondition(key="updated_at", range=DatetimeRange(gte=since, lt=until)))
+        
+        offset = None
+        while True:
+            points, offset = await self.client.scroll(
+                collection_name=self.collection_for("session"),
+                scroll_filter=Filter(must=conditions),
+                limit=batch_size,
+                offset=offset,
+                with_payload=True,
+                with_vectors=False
+            )
+            sessions = [point.payload["data"] for point in points if point.payload.get("data")]
+            if sessions:
+                yield sessions
+            if offset is None:
+                return
+    
+    def _zendesk_filter(self, status: Optional[str] = None, priority: Optional[str] = None, tags: Optional[List[str]] = None) -> Optional[Filter]:
+        conditions = self._type_conditions("zendesk_ticket")
+        if status:
+            conditions.append(FieldCondition(key="data.status", match=MatchValue(value=status)))
+        if priority:
+            conditions.append(FieldCondition(key="data.priority", match=MatchValue(value=priority)))
+        if tags:
+            conditions.append(FieldCondition(key="data.tags", match=MatchAny(any=tags)))
+        return Filter(must=conditions) if conditions else None
+    
+    async def get_zendesk_tickets(self, limit: int = 50, cursor: Optional[str] = None, status: Optional[str] = None,
+                                  priority: Optional[str] = None, tags: Optional[List[str]] = None,
+                                  sort: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Return one page of tickets and an opaque cursor for the next page (None on the last page).
+        
+        Unsorted pages resume from Qdrant's next_page_offset. Sorted pages use order_by,
+        which has no offset or secondary key, so the cursor is a (sort value, point ID)
+        keyset: tickets sharing a sort value are read in ID order with a plain scroll, and
+        order_by resumes strictly after that value.
+        """
+        state = decode_cursor(cursor) if cursor else {}
+        sort_field = None
+        direction = Direction.ASC
+        if sort:
+            sort_key = sort.lstrip("-")
+            if sort_key not in ZENDESK_SORT_FIELDS:
+                raise ValueError(f"Unsupported sort field: {sort_key}")
+            sort_field = ZENDESK_SORT_FIELDS[sort_key]
+            direction = Direction.DESC if sort.startswith("-") else Direction.ASC
+        
         try:
-            results = self.client.scroll(
-                collection_name=self.collection_name,
-                scroll_filter=Filter(
-                    must=[FieldCondition(key="type", match=MatchValue(value="zendesk_ticket"))]
-                ),
-                limit=limit,
-                offset=offset
+            scroll_filter = self._zendesk_filter(status, priority, tags)
+            
+            if sort_field is None:
+                points, next_offset = await self.client.scroll(
+                    collection_name=self.collection_for("zendesk_ticket"),
+                    scroll_filter=scroll_filter,
+                    limit=limit,
+                    offset=state.get("o"),
+                    with_vectors=False
+                )
+                next_cursor = encode_cursor({"o": str(next_offset)}) if next_offset is not None else None
+                return [point.payload.get("data", {}) for point in points], next_cursor
+            
+            base_conditions = list(scroll_filter.must) if scroll_filter else []
+            sort_key = sort_field.split(".", 1)[1]
+            
+            def sort_value(point) -> Any:
+                return point.payload.get("data", {}).get(sort_key)
+            
+            async def tied(value: Any, after_id: Optional[str], count: int) -> List[Any]:
+                # Tickets at exactly this sort value, in point ID order, after after_id.
+                points, _ = await self.client.scroll(
+                    collection_name=self.collection_for("zendesk_ticket"),
+                    scroll_filter=Filter(must=base_conditions + [
+                        FieldCondition(key=sort_field, range=DatetimeRange(gte=value, lte=value))
+                    ]),
+                    limit=count + 1,
+                    offset=after_id,
+                    with_vectors=False
+                )
+                if after_id is not None and points and str(points[0].id) == after_id:
+                    points = points[1:]
+                return points[:count]
+            
+            page: List[Any] = []
+            after_value = None
+            if "v" in state:
+                page = await tied(state["v"], state.get("i"), limit + 1)
+                if len(page) > limit:
+                    page = page[:limit]
+                    next_cursor = encode_cursor({"v": state["v"], "i": str(page[-1].id)})
+                    return [point.payload.get("data", {}) for point in page], next_cursor
+                after_value = state["v"]
+            
+            remaining = limit - len(page)
+            conditions = list(base_conditions)
+            if after_value is not None:
+                bound = {"gt": after_value} if direction == Direction.ASC else {"lt": after_value}
+                conditions.append(FieldCondition(key=sort_field, range=DatetimeRange(**bound)))
+            points, _ = await self.client.scroll(
+                collection_name=self.collection_for("zendesk_ticket"),
+                scroll_filter=Filter(must=conditions) if conditions else None,
+                limit=remaining + 1,
+                order_by=OrderBy(key=sort_field, direction=direction),
+                with_vectors=False
             )
             
-            tickets = []
-            for point in results[0]:
-                tickets.append(point.payload.get("data", {}))
-            return tickets
+            next_cursor = None
+            if len(points) > remaining:
+                next_value = sort_value(points[remaining])
+                if remaining and sort_value(points[remaining - 1]) == next_value:
+                    # The page would cut a run of equal values in arbitrary order; finish it in ID order.
+                    head = [point for point in points[:remaining] if sort_value(point) != next_value]
+                    ties = await tied(next_value, None, remaining - len(head))
+                    points = head + ties
+                    next_cursor = encode_cursor({"v": next_value, "i": str(ties[-1].id)})
+                else:
+                    points = points[:remaining]
+                    next_cursor = encode_cursor({"v": next_value})
+            page += points
+            return [point.payload.get("data", {}) for point in page], next_cursor
         except Exception as e:
             logging.error(f"Error retrieving Zendesk tickets: {str(e)}")
-            return []
+            return [], None
+    
+    async def count_zendesk_tickets(self, status: Optional[str] = None, priority: Optional[str] = None,
+                                    tags: Optional[List[str]] = None) -> int:
+        return await self._cached_count(
+            json.dumps([status, priority, sorted(tags or [])]), self._zendesk_filter(status, priority, tags)
+        )
+    
+    async def count_zendesk_term(self, term: str) -> int:
+        """Number of tickets whose subject or description contains the term (BM25 document frequency)."""
+        term_filter = self._zendesk_filter() or Filter()
+        term_filter.should = [FieldCondition(key=field, match=MatchText(text=term)) for field in ZENDESK_TEXT_FIELDS]
+        return await self._cached_count(json.dumps(["term", term]), term_filter)
+    
+    async def _cached_count(self, cache_key: str, count_filter: Optional[Filter]) -> int:
+        cached = self._count_cache.get(cache_key)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+        
+        result = await self.client.count(
+            collection_name=self.collection_for("zendesk_ticket"),
+            count_filter=count_filter,
+            exact=self.count_exact
+        )
+        self._count_cache[cache_key] = (time.monotonic() + self.count_cache_ttl, result.count)
+        return result.count
+    
+    async def search_zendesk_tickets(self, query_vector: List[float], limit: int = 10, status: Optional[str] = None,
+                                     tags: Optional[List[str]] = None, score_threshold: Optional[float] = None,
+                                     hnsw_ef: Optional[int] = None) -> List[Dict[str, Any]]:
+        results = await self.client.search(
+            collection_name=self.collection_for("zendesk_ticket"),
+            query_vector=query_vector,
+            query_filter=self._zendesk_filter(status=status, tags=tags),
+            limit=limit,
+            score_threshold=score_threshold,
+            search_params=self._search_params(self.collection_for("zendesk_ticket"), hnsw_ef),
+            with_vectors=False
+        )
+        return [{"id": str(result.id), "payload": result.payload, "score": result.score} for result in results]
+    
+    async def match_zendesk_tickets(self, terms: List[str], limit: int = 500, status: Optional[str] = None,
+                                    tags: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Tickets containing the terms in subject/description or as a tag, via the payload indexes.
+        
+        Tickets that match every term come first, then tickets that match any of them. Qdrant
+        returns each pass in ID order rather than by relevance, so when a pass has more
+        matches than `limit` an arbitrary subset of it is returned; callers re-rank the pool.
+        """
+        base_filter = self._zendesk_filter(status=status, tags=tags)
+        base_conditions = list(base_filter.must) if base_filter else []
+        term_conditions = [
+            Filter(should=[FieldCondition(key=field, match=MatchText(text=term)) for field in ZENDESK_TEXT_FIELDS]
+                   + [FieldCondition(key="data.tags", match=MatchValue(value=term))])
+            for term in terms
+        ]
+        
+        matches: Dict[str, Any] = {}
+        passes = [Filter(must=base_conditions + term_conditions)]
+        if len(terms) > 1:
+            passes.append(Filter(must=base_conditions, should=term_conditions))
+        for match_filter in passes:
+            if matches:
+                match_filter.must_not = [HasIdCondition(has_id=list(matches))]
+            points, _ = await self.client.scroll(
+                collection_name=self.collection_for("zendesk_ticket"),
+                scroll_filter=match_filter,
+                limit=limit - len(matches),
+                with_vectors=False
+            )
+            for point in points:
+                matches[str(point.id)] = point.payload
+            if len(matches) >= limit:
+                break
+        return [{"id": point_id, "payload": payload} for point_id, payload in matches.items()]
     
     async def semantic_search(self, query_vector: List[float], filter_type: str = None, limit: int = 5) -> List[Dict[str, Any]]:
         try:
-            search_filter = None
-            if filter_type:
-                search_filter = Filter(
-                    must=[FieldCondition(key="type", match=MatchValue(value=filter_type))]
+            results = await self.semantic_search_batch([{"vector": query_vector, "filter_type": filter_type, "limit": limit}])
+            return results[0]
+        except Exception as e:
+            logging.error(f"Error in semantic search: {str(e)}")
+            return []
+    
+    async def semantic_search_batch(self, queries: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """Run many similarity searches with one search_batch call per collection.
+        
+        Each query is a dict with "vector" and optional "filter_type", "limit", "filters"
+        (payload key -> value, or a list of values to match any of) and "score_threshold".
+        Results come back in query order.
+        """
+        requests_by_collection: Dict[str, List[Tuple[int, SearchRequest]]] = {}
+        for index, query in enumerate(queries):
+            filter_type = query.get("filter_type")
+            conditions = self._type_conditions(filter_type) if filter_type else []
+            for key, value in (query.get("filters") or {}).items():
+                match = MatchAny(any=value) if isinstance(value, list) else MatchValue(value=value)
+                conditions.append(FieldCondition(key=key, match=match))
+            
+            collection_names = [self.collection_for(filter_type)] if filter_type else list(self.collection_layout())
+            for collection_name in collection_names:
+                request = SearchRequest(
+                    vector=query["vector"],
+                    filter=Filter(must=conditions) if conditions else None,
+                    params=self._search_params(collection_name),
+                    limit=query.get("limit", 5),
+                    score_threshold=query.get("score_threshold"),
+                    with_payload=True
+                )
+                requests_by_collection.setdefault(collection_name, []).append((index, request))
+        
+        collection_names = list(requests_by_collection)
+        responses = await asyncio.gather(*[
+            self.client.search_batch(
+                collection_name=collection_name,
+                requests=[request for _, request in requests_by_collection[collection_name]]
+            )
+            for collection_name in collection_names
+        ])
+        
+        merged: List[List[Any]] = [[] for _ in queries]
+        for collection_name, response in zip(collection_names, responses):
+            for (index, _), results in zip(requests_by_collection[collection_name], response):
+                merged[index].extend(results)
+        
+        return [
+            [
+                {"payload": result.payload, "score": result.score}
+                for result in sorted(results, key=lambda result: result.score, reverse=True)[:query.get("limit", 5)]
+            ]
+            for query, results in zip(queries, merged)
+        ]
+    
+    async def compact_session_points(self, batch_size: int = 256, dry_run: bool = False) -> Dict[str, int]:
+        """Collapse legacy append-per-turn points into one deterministic point per session.
+
+        Applies to session, ticket and summary points. Session message histories are
+        merged in timestamp order; for the other types the newest point wins.
+        """
+        stats = {"scanned": 0, "collapsed": 0, "upserted": 0, "deleted": 0}
+        for point_type in ("session", "ticket", "summary"):
+            collection_name = self.collection_for(point_type)
+            # Only the fields needed to group and order the points are scrolled; full
+            # payloads and vectors are fetched per session, and vectors only for the kept point.
+            groups: Dict[str, List[Any]] = {}
+            offset = None
+            while True:
+                points, offset = await self.client.scroll(
+                    collection_name=collection_name,
+                    scroll_filter=self._type_filter(point_type),
+                    limit=batch_size,
+                    offset=offset,
+                    with_payload=["session_id", "updated_at", "created_at"],
+                    with_vectors=False
                 )
+                for point in points:
+                    session_id = point.payload.get("session_id")
+                    if session_id:
+                        groups.setdefault(session_id, []).append(point)
+                stats["scanned"] += len(points)
+                if offset is None:
+                    break
             
-            results = self.client.search(
+            for session_id, points in groups.items():
+                target_id = self.point_id(point_type, session_id)
+                stale_ids = [point.id for point in points if str(point.id) != target_id]
+                if not stale_ids:
+                    continue
+                
+                points.sort(key=lambda point: point.payload.get("updated_at") or point.payload.get("created_at") or "")
+                latest = (await self.client.retrieve(
+                    collection_name=collection_name,
+                    ids=[points[-1].id],
+                    with_payload=True,
+                    with_vectors=True
+                ))[0]
+                payload = dict(latest.payload)
+                payload["created_at"] = points[0].payload.get("created_at", payload.get("created_at"))
+                if point_type == "session":
+                    retrieved = await self.client.retrieve(
+                        collection_name=collection_name,
+                        ids=[point.id for point in points[:-1]],
+                        with_payload=["data"],
+                        with_vectors=False
+                    )
+                    order = {str(point.id): index for index, point in enumerate(points)}
+                    history = sorted(retrieved, key=lambda point: order[str(point.id)]) + [latest]
+                    data = dict(payload.get("data") or {})
+                    messages = []
+                    seen = set()
+                    for point in history:
+                        for message in (point.payload.get("data") or {}).get("messages", []):
+                            key = (message.get("role"), message.get("content"), message.get("timestamp"))
+                            if key not in seen:
+                                seen.add(key)
+                                messages.append(message)
+                    messages.sort(key=lambda message: message.get("timestamp") or "")
+                    data["messages"] = messages
+                    first_created_at = (history[0].payload.get("data") or {}).get("created_at")
+                    if first_created_at:
+                        data["created_at"] = first_created_at
+                    payload["data"] = data
+                    # Legacy points only had created_at; without updated_at they miss the index the
+                    # date-filtered summary export uses.
+                    payload["updated_at"] = data.get("updated_at") or latest.payload.get("created_at") or payload.get("created_at")
+                
+                stats["collapsed"] += 1
+                if dry_run:
+                    continue
+                
+                await self.client.upsert(
+                    collection_name=collection_name,
+                    points=[PointStruct(id=target_id, vector=latest.vector, payload=payload)]
+                )
+                await self.client.delete(
+                    collection_name=collection_name,
+                    points_selector=PointIdsList(points=stale_ids)
+                )
+                if point_type == "session":
+                    await self.session_cache.invalidate(session_id)
+                stats["upserted"] += 1
+                stats["deleted"] += len(stale_ids)
+        
+        logging.info(f"Compacted session points: {stats}")
+        return stats
+
+    async def migrate_to_split_collections(self, openai_service=None, batch_size: int = 256) -> Dict[str, int]:
+        """Copy points from the shared collection into the per-type collections.
+        
+        openai_service embeds the sample questions if the question collection has to be seeded.
+        """
+        if not self.split_collections:
+            raise ValueError("QDRANT_SPLIT_COLLECTIONS must be enabled to migrate to per-type collections")
+        
+        await self.initialize(openai_service)
+        copied: Dict[str, int] = {point_type: 0 for point_type in COLLECTION_SUFFIXES}
+        offset = None
+        while True:
+            points, offset = await self.client.scroll(
                 collection_name=self.collection_name,
-                query_vector=query_vector,
-                query_filter=search_filter,
-                limit=limit
+                limit=batch_size,
+                offset=offset,
+                with_payload=True,
+                with_vectors=True
             )
+            by_type: Dict[str, List[PointStruct]] = {}
+            for point in points:
+                point_type = point.payload.get("type")
+                if point_type in COLLECTION_SUFFIXES:
+                    by_type.setdefault(point_type, []).append(
+                        PointStruct(id=point.id, vector=point.vector, payload=point.payload)
+                    )
+            for point_type, type_points in by_type.items():
+                await self.client.upsert(collection_name=self.collection_for(point_type), points=type_points)
+                copied[point_type] += len(type_points)
+            if offset is None:
+                break
+        
+        logging.info(f"Copied points into per-type collections: {copied}")
+        return copied
+    
+    async def reembed(self, openai_service, target_collection: str, batch_size: int = 128) -> Dict[str, int]:
+        """Copy every point into collections named after target_collection with fresh vectors.
+        
+        Vectors are rebuilt from each point's source text with the configured embedding
+        model and dimensions; the source collections are left untouched. Point the app at
+        the new collections with QDRANT_COLLECTION once the copy has finished.
+        """
+        if target_collection == self.collection_name:
+            raise ValueError("Re-embed into a new collection, not the one currently in use")
+        
+        collections = await self.client.get_collections()
+        existing_collections = {col.name for col in collections.collections}
+        reembedded: Dict[str, int] = {point_type: 0 for point_type in COLLECTION_SUFFIXES}
+        
+        for collection_name, point_types in self.collection_layout().items():
+            if collection_name not in existing_collections:
+                continue
+            target_name = target_collection + collection_name[len(self.collection_name):]
+            if target_name not in existing_collections:
+                config = self.storage_config[collection_name]
+                await self.client.create_collection(
+                    collection_name=target_name,
+                    vectors_config=VectorParams(size=self.vector_size, distance=Distance.COSINE, on_disk=config["on_disk"]),
+                    hnsw_config=self._hnsw_config(config),
+                    quantization_config=self._quantization_config(config)
+                )
+            await self._ensure_payload_indexes(target_name, point_types)
             
-            return [{"payload": result.payload, "score": result.score} for result in results]
-        except Exception as e:
-            logging.error(f"Error in semantic search: {str(e)}")
-            return []
+            offset = None
+            while True:
+                points, offset = await self.client.scroll(
+                    collection_name=collection_name,
+                    limit=batch_size,
+                    offset=offset,
+                    with_payload=True,
+                    with_vectors=False
+                )
+                texts = [embedding_text(point.payload.get("type"), point.payload) for point in points]
+                to_embed = [text for text in texts if text]
+                embeddings = iter(await openai_service.get_embeddings_batch(to_embed) if to_embed else [])
+                
+                # Points without source text (e.g. a session with no user turn yet) keep a
+                # placeholder until they are next written.
+                new_points = [
+                    PointStruct(id=point.id, vector=next(embeddings) if text else self.placeholder_vector(), payload=point.payload)
+                    for point, text in zip(points, texts)
+                ]
+                if new_points:
+                    await self.client.upsert(collection_name=target_name, points=new_points)
+                for point in points:
+                    point_type = point.payload.get("type")
+                    if point_type in reembedded:
+                        reembedded[point_type] += 1
+                if offset is None:
+                    break
+        
+        logging.info(f"Re-embedded points into {target_collection}: {reembedded}")
+        return reembedded
@@ -0,0 +1,181 @@
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Callable, Awaitable
+import asyncio
+import copy
+import json
+import logging
+import os
+import time
+
+class InMemorySessionCacheBackend:
+    """Per-process cache. Other workers do not see its writes, so with more than one
+    worker each hit is checked against Qdrant (SESSION_CACHE_VERIFY); prefer Redis there."""
+    
+    shared = False
+    
+    def __init__(self, max_entries: int = 10000, ttl_seconds: int = 1800):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.evictions = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = asyncio.Lock()
+    
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        async with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.evictions += 1
+                return None
+            self._entries.move_to_end(key)
+            return copy.deepcopy(value)
+    
+    async def set(self, key: str, value: Dict[str, Any]):
+        async with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, copy.deepcopy(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    async def delete(self, key: str):
+        async with self._lock:
+            self._entries.pop(key, None)
+    
+    async def close(self):
+        pass
+    
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "memory", "size": len(self._entries), "max_entries": self.max_entries, "evictions": self.evictions}
+
+class RedisSessionCacheBackend:
+    """Shares the cache across workers through any Redis-compatible server (Redis, Valkey, KeyDB, Dragonfly)."""
+    
+    shared = True
+    
+    def __init__(self, url: str, ttl_seconds: int = 1800, key_prefix: str = "session:"):
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError("SESSION_CACHE_BACKEND=redis requires the 'redis' package") from e
+        
+        self.url = url
+        self.ttl_seconds = ttl_seconds
+        self.key_prefix = key_prefix
+        self.client = redis.from_url(url)
+    
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        value = await self.client.get(self.key_prefix + key)
+        if value is None:
+            return None
+        return json.loads(value)
+    
+    async def set(self, key: str, value: Dict[str, Any]):
+        await self.client.set(self.key_prefix + key, json.dumps(value), ex=self.ttl_seconds)
+    
+    async def delete(self, key: str):
+        await self.client.delete(self.key_prefix + key)
+    
+    async def close(self):
+        await self.client.aclose()
+    
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "redis", "url": self.url}
+
+class SessionCache:
+    def __init__(self, backend=None, verify: bool = False):
+        self.backend = backend
+        self.verify = verify and backend is not None and not backend.shared
+        self.hits = 0
+        self.verified_hits = 0
+        self.misses = 0
+        self.stale = 0
+    
+    @classmethod
+    def from_env(cls) -> "SessionCache":
+        backend_name = os.getenv("SESSION_CACHE_BACKEND", "memory").lower()
+        ttl_seconds = int(os.getenv("SESSION_CACHE_TTL", "1800"))
+        
+        # auto: verify hits when WEB_CONCURRENCY (read by gunicorn and uvicorn) asks for several workers.
+        verify_setting = os.getenv("SESSION_CACHE_VERIFY", "auto").lower()
+        multiple_workers = int(os.getenv("WEB_CONCURRENCY", "1")) > 1
+        verify = multiple_workers if verify_setting == "auto" else verify_setting == "true"
+        
+        if backend_name == "none":
+            return cls(backend=None)
+        if backend_name == "redis":
+            return cls(backend=RedisSessionCacheBackend(
+                url=os.getenv("SESSION_CACHE_REDIS_URL", "redis://localhost:6379/0"),
+                ttl_seconds=ttl_seconds
+            ))
+        if multiple_workers:
+            logging.warning(
+                "SESSION_CACHE_BACKEND=memory is per worker and WEB_CONCURRENCY > 1: "
+                + ("every hit is checked against Qdrant" if verify else "workers can serve stale sessions")
+                + "; use SESSION_CACHE_BACKEND=redis"
+            )
+        return cls(backend=InMemorySessionCacheBackend(
+            max_entries=int(os.getenv("SESSION_CACHE_MAX_ENTRIES", "10000")),
+            ttl_seconds=ttl_seconds
+        ), verify=verify)
+    
+    async def get(self, session_id: str,
+                  is_current: Optional[Callable[[Dict[str, Any]], Awaitable[bool]]] = None) -> Optional[Dict[str, Any]]:
+        """Return the cached session. When verify is on, a hit is only served if is_current accepts it."""
+        if self.backend is None:
+            return None
+        try:
+            value = await self.backend.get(session_id)
+        except Exception as e:
+            logging.error(f"Session cache read error: {str(e)}")
+            value = None
+        
+        if value is None:
+            self.misses += 1
+        elif self.verify and is_current is not None:
+            if not await is_current(value):
+                self.stale += 1
+                return None
+            self.verified_hits += 1
+        else:
+            self.hits += 1
+        return value
+    
+    async def set(self, session_id: str, data: Dict[str, Any]):
+        if self.backend is None:
+            return
+        try:
+            await self.backend.set(session_id, data)
+        except Exception as e:
+            logging.error(f"Session cache write error: {str(e)}")
+    
+    async def invalidate(self, session_id: str):
+        if self.backend is None:
+            return
+        try:
+            await self.backend.delete(session_id)
+        except Exception as e:
+            logging.error(f"Session cache invalidation error: {str(e)}")
+    
+    async def close(self):
+        if self.backend is not None:
+            await self.backend.close()
+    
+    def stats(self) -> Dict[str, Any]:
+        served = self.hits + self.verified_hits
+        lookups = served + self.stale + self.misses
+        stats = {
+            "enabled": self.backend is not None,
+            "verify": self.verify,
+            "hits": self.hits,
+            "verified_hits": self.verified_hits,
+            "misses": self.misses,
+            "hit_rate": served / lookups if lookups else 0.0,
+            "stale": self.stale
+        }
+        if self.backend is not None:
+            stats.update(self.backend.stats())
+        return stats
@@ -1,12 +1,19 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File
+from fastapi import FastAPI, HTTPException, UploadFile, File, Query, Request, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 import os
 from dotenv import load_dotenv
-from app.database.qdrant_client import QdrantManager
+from datetime import datetime
+from typing import List, Optional
+from urllib.parse import quote
+from app.database.qdrant_client import QdrantManager, COLLECTION_SUFFIXES
 from app.workflows.enrollment_workflow import EnrollmentWorkflow
 from app.services.zendesk_service import ZendeskService
-from app.schemas.enrollment import ChatRequest, ChatResponse, SessionResponse, TicketResponse
+from app.services.openai_service import OpenAIService
+from app.services.import_jobs import ImportJobManager
+from app.services.summary_export import SummaryExporter
+from app.schemas.enrollment import ChatRequest, ChatResponse, SessionResponse, TicketResponse, BatchSearchRequest, BatchSearchResponse
+import asyncio
 import uuid
 import logging
 
@@ -24,17 +31,59 @@ app.add_middleware(
 )
 
 qdrant_manager = QdrantManager()
-enrollment_workflow = EnrollmentWorkflow(qdrant_manager)
-zendesk_service = ZendeskService(qdrant_manager)
+openai_service = OpenAIService()
+enrollment_workflow = EnrollmentWorkflow(qdrant_manager, openai_service)
+zendesk_service = ZendeskService(qdrant_manager, openai_service, enrollment_workflow.pii_service)
+import_jobs = ImportJobManager(zendesk_service)
+summary_exporter = SummaryExporter(qdrant_manager)
+pii_warmup = os.getenv("PII_WARMUP", "false").lower() == "true"
+pii_warmup_task = None
 
 @app.on_event("startup")
 async def startup_event():
-    await qdrant_manager.initialize()
+    await qdrant_manager.initialize(openai_service)
+    await enrollment_workflow.embedding_queue.start()
+    await import_jobs.start()
+    if pii_warmup:
+        global pii_warmup_task
+        pii_warmup_task = asyncio.create_task(enrollment_workflow.pii_service.warm_up())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if pii_warmup_task is not None:
+        pii_warmup_task.cancel()
+    await import_jobs.stop()
+    await enrollment_workflow.embedding_queue.stop()
+    await qdrant_manager.close()
+    await openai_service.close()
+    enrollment_workflow.pii_service.close()
+    enrollment_workflow.pdf_service.close()
+    summary_exporter.close()
 
 @app.get("/healthz")
 async def healthz():
     return {"status": "ok"}
 
+@app.get("/readyz")
+async def readyz():
+    # With PII_WARMUP the instance only reports ready once the Presidio models are loaded;
+    # otherwise they load lazily on first use and do not gate readiness.
+    checks = {"pii_models": enrollment_workflow.pii_service.ready}
+    if pii_warmup and not checks["pii_models"]:
+        return JSONResponse(status_code=503, content={"status": "starting", "checks": checks})
+    return {"status": "ready", "checks": checks}
+
+@app.get("/api/metrics")
+async def metrics():
+    return {
+        "session_cache": qdrant_manager.session_cache.stats(),
+        "embedding_queue": enrollment_workflow.embedding_queue.stats(),
+        "embedding_cache": openai_service.embedding_cache.stats(),
+        "openai": openai_service.stats(),
+        "pii": enrollment_workflow.pii_service.stats(),
+        "pdf": enrollment_workflow.pdf_service.stats()
+    }
+
 @app.post("/api/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest):
     try:
@@ -71,38 +120,129 @@ async def get_ticket(session_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/summary/{session_id}")
-async def get_summary(session_id: str):
+async def get_summary(session_id: str, request: Request, background_tasks: BackgroundTasks):
     try:
-        pdf_path = await enrollment_workflow.generate_pdf_summary(session_id)
-        if not pdf_path or not os.path.exists(pdf_path):
+        artifact = await enrollment_workflow.generate_pdf_summary(
+            session_id, if_none_match=request.headers.get("if-none-match")
+        )
+        # no-cache: clients keep the PDF but revalidate, so an edited session is never served stale.
+        headers = {"ETag": f'"{artifact["etag"]}"', "Cache-Control": "private, no-cache"}
+        if artifact.get("not_modified"):
+            return Response(status_code=304, headers=headers)
+        # Runs after the PDF has been sent, so the download never waits on the embedding.
+        background_tasks.add_task(enrollment_workflow.record_summary, session_id)
+        filename = f"enrollment_summary_{session_id}.pdf"
+        if artifact["body"] is not None:
+            headers["Content-Disposition"] = f"attachment; filename*=utf-8''{quote(filename)}"
+            return Response(content=artifact["body"], media_type="application/pdf", headers=headers)
+        if not os.path.exists(artifact["path"]):
             raise HTTPException(status_code=404, detail="Summary not found")
         return FileResponse(
-            pdf_path,
+            artifact["path"],
             media_type="application/pdf",
-            filename=f"enrollment_summary_{session_id}.pdf"
+            filename=filename,
+            headers=headers
         )
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         logging.error(f"Summary generation error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/summaries/export")
+async def export_summaries(since: Optional[datetime] = None, until: Optional[datetime] = None):
+    if since and until and since >= until:
+        raise HTTPException(status_code=400, detail="since must be earlier than until")
+    filename = f"enrollment_summaries_{datetime.utcnow().strftime('%Y%m%d')}.zip"
+    return StreamingResponse(
+        summary_exporter.export_zip(since, until),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@app.post("/api/search/batch", response_model=BatchSearchResponse)
+async def search_batch(request: BatchSearchRequest):
+    for query in request.queries:
+        if query.type and query.type not in COLLECTION_SUFFIXES:
+            raise HTTPException(status_code=400, detail=f"Unknown point type: {query.type}")
+    try:
+        vectors = await openai_service.get_embeddings_batch([query.text for query in request.queries])
+        results = await qdrant_manager.semantic_search_batch([
+            {
+                "vector": vector,
+                "filter_type": query.type,
+                "limit": query.limit,
+                "filters": query.filters,
+                "score_threshold": query.score_threshold
+            }
+            for query, vector in zip(request.queries, vectors)
+        ])
+        return BatchSearchResponse(results=results)
+    except Exception as e:
+        logging.error(f"Batch search error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.post("/api/zendesk/datadump")
 async def import_zendesk_datadump(file: UploadFile = File(...)):
     try:
-        result = await zendesk_service.import_datadump(file)
-        return {"message": "Datadump imported successfully", "imported_count": result}
+        job = await import_jobs.submit(file)
+        return {"message": "Datadump import queued", "job_id": job["job_id"], "status": job["status"]}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logging.error(f"Zendesk datadump import error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/zendesk/import/{job_id}")
+async def get_zendesk_import_status(job_id: str):
+    try:
+        status = await import_jobs.get_status(job_id)
+    except Exception as e:
+        logging.error(f"Zendesk import status error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    if not status:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return status
+
 @app.get("/api/zendesk/tickets")
-async def get_zendesk_tickets(limit: int = 50, offset: int = 0):
+async def get_zendesk_tickets(
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    priority: Optional[str] = None,
+    tags: Optional[List[str]] = Query(None),
+    sort: Optional[str] = None
+):
     try:
-        tickets = await zendesk_service.get_tickets(limit=limit, offset=offset)
-        return {"tickets": tickets, "total": len(tickets)}
+        return await zendesk_service.get_tickets(
+            limit=limit, cursor=cursor, status=status, priority=priority, tags=tags, sort=sort
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logging.error(f"Zendesk tickets retrieval error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/zendesk/search")
+async def search_zendesk_tickets(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(10, ge=1, le=100),
+    status: Optional[str] = None,
+    tags: Optional[List[str]] = Query(None),
+    score_threshold: Optional[float] = None,
+    hnsw_ef: Optional[int] = Query(None, ge=1)
+):
+    try:
+        results = await zendesk_service.search_tickets(
+            q, limit=limit, status=status, tags=tags, score_threshold=score_threshold, hnsw_ef=hnsw_ef
+        )
+        return {"query": q, "results": results, "total": len(results)}
+    except Exception as e:
+        logging.error(f"Zendesk search error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.post("/api/zendesk/ticket")
 async def create_zendesk_ticket(ticket_data: dict):
     return {"message": "Zendesk real-time API integration - Coming Soon", "ticket_id": str(uuid.uuid4())}
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from typing import Dict, Any, Optional, List
 from datetime import datetime
 
@@ -46,3 +46,16 @@ class ZendeskTicket(BaseModel):
     created_at: str
     updated_at: str
     tags: List[str]
+
+class SearchQuery(BaseModel):
+    text: str = Field(..., min_length=1)
+    type: Optional[str] = None
+    limit: int = Field(5, ge=1, le=100)
+    filters: Dict[str, Any] = {}
+    score_threshold: Optional[float] = None
+
+class BatchSearchRequest(BaseModel):
+    queries: List[SearchQuery] = Field(..., min_length=1, max_length=256)
+
+class BatchSearchResponse(BaseModel):
+    results: List[List[Dict[str, Any]]]
@@ -0,0 +1,149 @@
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+
+TEMP_PREFIX = ".tmp-"
+KEY_PATTERN = re.compile(r"[A-Za-z0-9_-]+")
+
+class ArtifactStore:
+    """Generated files kept in one directory, evicted by age, count and total size.
+    
+    Files are written under a temporary name and renamed into place, so readers never
+    see a partial file and concurrent writers of the same key cannot interleave.
+    Artifacts up to memory_max_bytes are kept in memory only and never touch the disk.
+    Files left by a previous run are adopted on startup, or deleted when expired.
+    """
+    
+    def __init__(self, directory: str, max_bytes: int, max_entries: int, ttl: float, memory_max_bytes: int = 0, suffix: str = ""):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.memory_max_bytes = memory_max_bytes
+        self.suffix = suffix
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evicted = 0
+        self.expired = 0
+        self._adopt_existing()
+    
+    def _path(self, key: str) -> str:
+        if not KEY_PATTERN.fullmatch(key):
+            raise ValueError(f"Invalid artifact key: {key}")
+        return os.path.join(self.directory, f"{key}{self.suffix}")
+    
+    def _adopt_existing(self):
+        if not os.path.isdir(self.directory):
+            return
+        now = time.time()
+        adopted = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            key = name[:len(name) - len(self.suffix)] if name.endswith(self.suffix) else None
+            try:
+                stat = os.stat(path)
+                if name.startswith(TEMP_PREFIX) or (self.ttl and now - stat.st_mtime > self.ttl):
+                    os.remove(path)
+                elif key and KEY_PATTERN.fullmatch(key):
+                    adopted.append((stat.st_mtime, key, path, stat.st_size))
+            except OSError as e:
+                logging.error(f"Artifact store cleanup error for {path}: {str(e)}")
+        
+        with self._lock:
+            for created_at, key, path, size in sorted(adopted):
+                self._entries[key] = {"key": key, "path": path, "body": None, "size": size, "created_at": created_at}
+                self._bytes += size
+            self._evict(now)
+        if adopted:
+            logging.info(f"Adopted {len(self._entries)} artifacts from {self.directory}")
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return {"key", "path", "body", "size", "created_at"}; exactly one of path and body is set."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self._is_expired(entry, time.time()):
+                self._remove(key)
+                self.expired += 1
+                return None
+            if entry["path"] is not None and not os.path.exists(entry["path"]):
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+    
+    def put(self, key: str, data: bytes) -> Dict[str, Any]:
+        """Store data under key, replacing any previous version. Blocking: call it from a worker thread."""
+        path = self._path(key)
+        now = time.time()
+        if len(data) <= self.memory_max_bytes:
+            entry = {"key": key, "path": None, "body": data, "size": len(data), "created_at": now}
+        else:
+            self._write_atomic(path, data)
+            entry = {"key": key, "path": path, "body": None, "size": len(data), "created_at": now}
+        
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous["size"]
+                if previous["path"] is not None and entry["path"] is None:
+                    self._unlink(previous["path"])
+            self._entries[key] = entry
+            self._bytes += entry["size"]
+            self._evict(now, keep=key)
+        return entry
+    
+    def _write_atomic(self, path: str, data: bytes):
+        os.makedirs(self.directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix=TEMP_PREFIX)
+        try:
+            with os.fdopen(fd, "wb") as temp_file:
+                temp_file.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            self._unlink(temp_path)
+            raise
+    
+    def _is_expired(self, entry: Dict[str, Any], now: float) -> bool:
+        return bool(self.ttl) and now - entry["created_at"] > self.ttl
+    
+    def _evict(self, now: float, keep: Optional[str] = None):
+        for key in [key for key, entry in self._entries.items() if self._is_expired(entry, now)]:
+            self._remove(key)
+            self.expired += 1
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            if oldest == keep:
+                break
+            self._remove(oldest)
+            self.evicted += 1
+    
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        self._bytes -= entry["size"]
+        if entry["path"] is not None:
+            self._unlink(entry["path"])
+    
+    def _unlink(self, path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            memory_entries = sum(1 for entry in self._entries.values() if entry["body"] is not None)
+            return {
+                "entries": len(self._entries),
+                "memory_entries": memory_entries,
+                "bytes": self._bytes,
+                "evicted": self.evicted,
+                "expired": self.expired
+            }
@@ -0,0 +1,105 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Awaitable, Callable, Optional
+import asyncio
+import re
+import zlib
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+class EmbeddingBackend:
+    """Turns texts into vectors. cache_key namespaces entries in the EmbeddingCache."""
+    
+    name = "base"
+    cacheable = True
+    
+    def __init__(self, cache_key: str, dimensions: int):
+        self.cache_key = cache_key
+        self.dimensions = dimensions
+    
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        raise NotImplementedError
+    
+    async def close(self):
+        pass
+
+class OpenAIEmbeddingBackend(EmbeddingBackend):
+    name = "openai"
+    
+    def __init__(self, cache_key: str, dimensions: int, embeddings, call_with_retries: Callable[..., Awaitable], estimate_tokens: Callable[..., int]):
+        super().__init__(cache_key, dimensions)
+        self.embeddings = embeddings
+        self.call_with_retries = call_with_retries
+        self.estimate_tokens = estimate_tokens
+    
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        return await self.call_with_retries(
+            lambda: self.embeddings.aembed_documents(texts),
+            tokens=self.estimate_tokens(*texts)
+        )
+
+class LocalEmbeddingBackend(EmbeddingBackend):
+    """Runs a CPU embedding function over fixed-size chunks in a thread pool."""
+    
+    def __init__(self, cache_key: str, dimensions: int, workers: int = 2, batch_size: int = 64):
+        super().__init__(cache_key, dimensions)
+        self.batch_size = batch_size
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"embed-{self.name}")
+    
+    def embed_sync(self, texts: List[str]) -> np.ndarray:
+        raise NotImplementedError
+    
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        loop = asyncio.get_running_loop()
+        chunks = await asyncio.gather(*[
+            loop.run_in_executor(self._executor, self.embed_sync, texts[start:start + self.batch_size])
+            for start in range(0, len(texts), self.batch_size)
+        ])
+        return [vector.tolist() for chunk in chunks for vector in chunk]
+    
+    async def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+class HashingEmbeddingBackend(LocalEmbeddingBackend):
+    """Signed feature hashing of word unigrams and bigrams, L2-normalised.
+    
+    No model and no network: texts that share words get high cosine similarity, which
+    is enough to exercise search and import realistically. crc32 keeps the mapping
+    stable across processes, unlike the salted built-in hash().
+    """
+    
+    name = "hashing"
+    cacheable = False
+    
+    def embed_sync(self, texts: List[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = TOKEN_PATTERN.findall(text.lower())
+            features = tokens + [f"{first} {second}" for first, second in zip(tokens, tokens[1:])]
+            for feature in features:
+                digest = zlib.crc32(feature.encode("utf-8"))
+                matrix[row, digest % self.dimensions] += 1.0 if digest & 0x80000000 else -1.0
+        # Sublinear term frequency so one repeated word does not dominate the vector.
+        matrix = np.sign(matrix) * np.log1p(np.abs(matrix))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.where(norms == 0, 1.0, norms)
+
+class SentenceTransformerEmbeddingBackend(LocalEmbeddingBackend):
+    name = "sentence-transformers"
+    
+    def __init__(self, model_name: str, dimensions: int, workers: int = 2, batch_size: int = 64, device: Optional[str] = None):
+        super().__init__(f"st:{model_name}:{dimensions}", dimensions, workers, batch_size)
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError(
+                "EMBEDDING_BACKEND=sentence-transformers requires the sentence-transformers package "
+                "(poetry install --extras local-embeddings)"
+            ) from e
+        self.model = SentenceTransformer(model_name, device=device, truncate_dim=dimensions)
+        model_dimensions = self.model.get_sentence_embedding_dimension()
+        if model_dimensions != dimensions:
+            raise ValueError(f"{model_name} produces {model_dimensions}-dimensional embeddings, EMBEDDING_DIMENSIONS is {dimensions}")
+    
+    def embed_sync(self, texts: List[str]) -> np.ndarray:
+        return self.model.encode(texts, batch_size=self.batch_size, normalize_embeddings=True, convert_to_numpy=True)
@@ -0,0 +1,137 @@
+from array import array
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional
+import asyncio
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+
+class EmbeddingCache:
+    """Content-addressed embedding cache keyed by (model, normalized text hash).
+    
+    Lookups hit an in-memory LRU first and fall back to an optional SQLite file of
+    float32 vectors that survives restarts.
+    """
+    
+    def __init__(self, max_entries: int = 10000, disk_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.disk_path = disk_path
+        self._memory: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        
+        if disk_path:
+            directory = os.path.dirname(disk_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(disk_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+            self._db.commit()
+    
+    @classmethod
+    def from_env(cls) -> "EmbeddingCache":
+        return cls(
+            max_entries=int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "10000")),
+            disk_path=os.getenv("EMBEDDING_CACHE_PATH") or None
+        )
+    
+    @staticmethod
+    def key(model: str, text: str) -> str:
+        normalized = " ".join(text.split())
+        return hashlib.sha256(f"{model}\x00{normalized}".encode("utf-8")).hexdigest()
+    
+    async def get_many(self, model: str, texts: List[str]) -> List[Optional[List[float]]]:
+        keys = [self.key(model, text) for text in texts]
+        results: List[Optional[List[float]]] = []
+        disk_lookups: Dict[str, List[int]] = {}
+        
+        for index, key in enumerate(keys):
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+            elif self._db is not None:
+                disk_lookups.setdefault(key, []).append(index)
+            else:
+                self.misses += 1
+            results.append(vector)
+        
+        if disk_lookups:
+            try:
+                found = await asyncio.to_thread(self._read_disk, list(disk_lookups))
+            except Exception as e:
+                logging.error(f"Embedding cache read error: {str(e)}")
+                found = {}
+            for key, indexes in disk_lookups.items():
+                vector = found.get(key)
+                if vector is None:
+                    self.misses += len(indexes)
+                    continue
+                self._remember(key, vector)
+                self.disk_hits += len(indexes)
+                for index in indexes:
+                    results[index] = vector
+        
+        return results
+    
+    async def set_many(self, model: str, texts: List[str], vectors: List[List[float]]):
+        entries = {self.key(model, text): vector for text, vector in zip(texts, vectors)}
+        for key, vector in entries.items():
+            self._remember(key, vector)
+        
+        if self._db is not None:
+            try:
+                await asyncio.to_thread(self._write_disk, entries)
+            except Exception as e:
+                logging.error(f"Embedding cache write error: {str(e)}")
+    
+    def _remember(self, key: str, vector: List[float]):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+    
+    def _read_disk(self, keys: List[str]) -> Dict[str, List[float]]:
+        found: Dict[str, List[float]] = {}
+        with self._db_lock:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._db.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+        return found
+    
+    def _write_disk(self, entries: Dict[str, List[float]]):
+        with self._db_lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [(key, array("f", vector).tobytes()) for key, vector in entries.items()]
+            )
+            self._db.commit()
+    
+    def close(self):
+        if self._db is not None:
+            with self._db_lock:
+                self._db.close()
+            self._db = None
+    
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "max_entries": self.max_entries,
+            "disk_enabled": self._db is not None
+        }
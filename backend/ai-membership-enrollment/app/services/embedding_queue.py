@@ -0,0 +1,100 @@
+from typing import Dict, Any, List, Optional, Tuple
+import asyncio
+import itertools
+import logging
+import os
+from app.database.qdrant_client import QdrantManager
+from app.services.openai_service import OpenAIService
+
+class EmbeddingQueue:
+    """Computes point vectors off the request path.
+    
+    Callers store the point with a placeholder vector and submit the text to embed. A
+    background worker drains pending texts in batches through get_embeddings_batch and
+    patches the vectors in with update_vectors. Re-submitting a point before its batch
+    is taken replaces the pending text, so only the latest text is embedded.
+    """
+    
+    def __init__(self, qdrant_manager: QdrantManager, openai_service: OpenAIService):
+        self.qdrant_manager = qdrant_manager
+        self.openai_service = openai_service
+        self.batch_size = int(os.getenv("EMBEDDING_QUEUE_BATCH_SIZE", "64"))
+        self.flush_interval = float(os.getenv("EMBEDDING_QUEUE_FLUSH_INTERVAL", "0.5"))
+        self._pending: Dict[Tuple[str, str], str] = {}
+        self._wakeup = asyncio.Event()
+        self._worker: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.submitted = 0
+        self.coalesced = 0
+        self.batches = 0
+        self.embedded = 0
+        self.failed = 0
+    
+    def submit(self, point_type: str, key: str, text: str):
+        pending_key = (point_type, key)
+        if pending_key in self._pending:
+            del self._pending[pending_key]
+            self.coalesced += 1
+        self._pending[pending_key] = text
+        self.submitted += 1
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+    
+    async def start(self):
+        if self._worker is None:
+            self._stopping = False
+            self._worker = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        if self._worker is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        await self._worker
+        self._worker = None
+    
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            
+            while self._pending:
+                await self._flush_batch()
+                if not self._stopping and len(self._pending) < self.batch_size:
+                    break
+            
+            if self._stopping and not self._pending:
+                return
+    
+    async def _flush_batch(self):
+        batch: List[Tuple[Tuple[str, str], str]] = []
+        for pending_key in list(itertools.islice(self._pending, self.batch_size)):
+            batch.append((pending_key, self._pending.pop(pending_key)))
+        
+        try:
+            embeddings = await self.openai_service.get_embeddings_batch([text for _, text in batch])
+            
+            vectors_by_type: Dict[str, Dict[str, List[float]]] = {}
+            for ((point_type, key), _), embedding in zip(batch, embeddings):
+                vectors_by_type.setdefault(point_type, {})[key] = embedding
+            for point_type, vectors in vectors_by_type.items():
+                await self.qdrant_manager.update_vectors(point_type, vectors)
+            
+            self.batches += 1
+            self.embedded += len(batch)
+        except Exception as e:
+            self.failed += len(batch)
+            logging.error(f"Deferred embedding batch failed: {str(e)}")
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": len(self._pending),
+            "submitted": self.submitted,
+            "coalesced": self.coalesced,
+            "batches": self.batches,
+            "embedded": self.embedded,
+            "failed": self.failed
+        }
@@ -0,0 +1,380 @@
+from fastapi import UploadFile
+from typing import Dict, Any, List, Optional, BinaryIO, Tuple
+from datetime import datetime, timedelta
+import asyncio
+import itertools
+import logging
+import os
+import shutil
+import socket
+import sqlite3
+import threading
+import uuid
+from app.services.zendesk_import import ImportProgress, detect_format, iter_ticket_batches
+from app.services.zendesk_service import ZendeskService
+
+JOB_FIELDS = [
+    "job_id", "filename", "file_path", "file_format", "file_size", "batch_size", "status",
+    "parsed", "embedded", "skipped", "stored", "bytes_read", "committed_batches", "error",
+    "created_at", "started_at", "updated_at", "finished_at", "owner", "lease_expires"
+]
+
+class LeaseLostError(Exception):
+    """Another process took over the job after this one's lease expired."""
+
+class ImportJobStore:
+    """SQLite-backed job table; doubles as the queue so jobs survive a restart."""
+    
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS import_jobs (
+                    job_id TEXT PRIMARY KEY,
+                    filename TEXT NOT NULL,
+                    file_path TEXT NOT NULL,
+                    file_format TEXT NOT NULL,
+                    file_size INTEGER NOT NULL,
+                    batch_size INTEGER NOT NULL,
+                    status TEXT NOT NULL,
+                    parsed INTEGER NOT NULL DEFAULT 0,
+                    embedded INTEGER NOT NULL DEFAULT 0,
+                    skipped INTEGER NOT NULL DEFAULT 0,
+                    stored INTEGER NOT NULL DEFAULT 0,
+                    bytes_read INTEGER NOT NULL DEFAULT 0,
+                    committed_batches INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    created_at TEXT NOT NULL,
+                    started_at TEXT,
+                    updated_at TEXT NOT NULL,
+                    finished_at TEXT,
+                    owner TEXT,
+                    lease_expires TEXT
+                )
+            """)
+            columns = {row[1] for row in self._db.execute("PRAGMA table_info(import_jobs)")}
+            if "skipped" not in columns:
+                self._db.execute("ALTER TABLE import_jobs ADD COLUMN skipped INTEGER NOT NULL DEFAULT 0")
+            for column in ("owner", "lease_expires"):
+                if column not in columns:
+                    self._db.execute(f"ALTER TABLE import_jobs ADD COLUMN {column} TEXT")
+            self._db.commit()
+    
+    def create(self, job: Dict[str, Any]):
+        columns = ", ".join(job)
+        placeholders = ", ".join("?" * len(job))
+        with self._lock:
+            self._db.execute(f"INSERT INTO import_jobs ({columns}) VALUES ({placeholders})", list(job.values()))
+            self._db.commit()
+    
+    def update(self, job_id: str, expected_owner: Optional[str] = None, **fields: Any) -> bool:
+        """Update the job's fields; with expected_owner, only while that process still holds it."""
+        fields["updated_at"] = datetime.utcnow().isoformat()
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        query = f"UPDATE import_jobs SET {assignments} WHERE job_id = ?"
+        parameters = [*fields.values(), job_id]
+        if expected_owner is not None:
+            query += " AND owner = ?"
+            parameters.append(expected_owner)
+        with self._lock:
+            changed = self._db.execute(query, parameters).rowcount
+            self._db.commit()
+        return changed == 1
+    
+    def claim(self, job_id: str, owner: str, lease_seconds: float) -> bool:
+        """Atomically take an unfinished job that no live process holds. Several app workers
+        share this database, so only the one whose UPDATE changes the row may run the job."""
+        now = datetime.utcnow()
+        with self._lock:
+            changed = self._db.execute(
+                """
+                UPDATE import_jobs
+                SET status = 'running', owner = ?, lease_expires = ?,
+                    started_at = COALESCE(started_at, ?), updated_at = ?
+                WHERE job_id = ? AND status IN ('queued', 'running')
+                    AND (lease_expires IS NULL OR lease_expires < ?)
+                """,
+                (owner, (now + timedelta(seconds=lease_seconds)).isoformat(), now.isoformat(), now.isoformat(),
+                 job_id, now.isoformat())
+            ).rowcount
+            self._db.commit()
+        return changed == 1
+    
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT {', '.join(JOB_FIELDS)} FROM import_jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        return dict(zip(JOB_FIELDS, row)) if row else None
+    
+    def claimable(self) -> List[Dict[str, Any]]:
+        """Unfinished jobs that are not leased, or whose lease has expired."""
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT {', '.join(JOB_FIELDS)} FROM import_jobs WHERE status IN ('queued', 'running') "
+                "AND (lease_expires IS NULL OR lease_expires < ?) ORDER BY created_at",
+                (datetime.utcnow().isoformat(),)
+            ).fetchall()
+        return [dict(zip(JOB_FIELDS, row)) for row in rows]
+    
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+class JobProgress(ImportProgress):
+    """Tracks counters for one job and checkpoints the contiguous prefix of stored batches."""
+    
+    def __init__(self, store: ImportJobStore, job: Dict[str, Any], stream: BinaryIO, owner: str, lease_seconds: float):
+        self.store = store
+        self.job_id = job["job_id"]
+        self.owner = owner
+        self.lease_seconds = lease_seconds
+        self.stream = stream
+        # stored_count and committed_unchanged cover only the committed batch prefix, so a
+        # resumed job starts from them. In a committed batch every stored ticket was embedded.
+        self.committed_batches = job["committed_batches"]
+        self.stored_count = job["stored"]
+        self.committed_unchanged = job["skipped"]
+        self.parsed_count = 0
+        self.embedded_count = job["stored"]
+        self.skipped_count = job["skipped"]
+        self.bytes_read = job["bytes_read"]
+        self._completed: Dict[int, Tuple[int, int]] = {}
+    
+    def parsed(self, count: int):
+        self.parsed_count += count
+        try:
+            self.bytes_read = self.stream.tell()
+        except (OSError, ValueError):
+            pass
+    
+    def embedded(self, count: int):
+        self.embedded_count += count
+    
+    def skipped(self, count: int):
+        self.skipped_count += count
+    
+    async def committed(self, batch_index: int, stored: int, unchanged: int):
+        self._completed[batch_index] = (stored, unchanged)
+        while self.committed_batches in self._completed:
+            batch_stored, batch_unchanged = self._completed.pop(self.committed_batches)
+            self.stored_count += batch_stored
+            self.committed_unchanged += batch_unchanged
+            self.committed_batches += 1
+        
+        # Each checkpoint also renews the lease, and fails once another process has claimed the job.
+        renewed = await asyncio.to_thread(
+            self.store.update,
+            self.job_id,
+            expected_owner=self.owner,
+            parsed=self.parsed_count,
+            embedded=self.embedded_count,
+            skipped=self.committed_unchanged,
+            stored=self.stored_count,
+            bytes_read=self.bytes_read,
+            committed_batches=self.committed_batches,
+            lease_expires=(datetime.utcnow() + timedelta(seconds=self.lease_seconds)).isoformat()
+        )
+        if not renewed:
+            raise LeaseLostError(f"Lost the lease on import job {self.job_id}")
+
+class ImportJobManager:
+    def __init__(self, zendesk_service: ZendeskService):
+        self.zendesk_service = zendesk_service
+        self.job_dir = os.getenv("IMPORT_JOB_DIR", os.path.join(os.getcwd(), "data", "import_jobs"))
+        self.worker_count = int(os.getenv("IMPORT_JOB_WORKERS", "1"))
+        # A job whose lease is not renewed within this time (one batch) is taken over by another process.
+        self.lease_seconds = float(os.getenv("IMPORT_JOB_LEASE_SECONDS", "300"))
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.store = ImportJobStore(os.path.join(self.job_dir, "jobs.sqlite"))
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._workers: List[asyncio.Task] = []
+        self._reaper: Optional[asyncio.Task] = None
+        self._progress: Dict[str, JobProgress] = {}
+    
+    async def start(self):
+        await self._queue_claimable()
+        for _ in range(self.worker_count):
+            self._workers.append(asyncio.create_task(self._worker()))
+        self._reaper = asyncio.create_task(self._reap_expired_leases())
+    
+    async def _queue_claimable(self):
+        for job in await asyncio.to_thread(self.store.claimable):
+            if job["job_id"] not in self._progress:
+                logging.info(f"Queueing Zendesk import job {job['job_id']} from batch {job['committed_batches']}")
+                self._queue.put_nowait(job["job_id"])
+    
+    async def _reap_expired_leases(self):
+        # Picks up jobs left behind when the process holding them died.
+        while True:
+            await asyncio.sleep(self.lease_seconds)
+            try:
+                await self._queue_claimable()
+            except Exception as e:
+                logging.error(f"Import job lease scan failed: {str(e)}")
+    
+    async def stop(self):
+        if self._reaper is not None:
+            self._reaper.cancel()
+        running = list(self._progress)
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        
+        # Release the leases so a restarted process resumes these jobs at once, rather than
+        # after they expire.
+        for job_id in running:
+            try:
+                await asyncio.to_thread(self.store.update, job_id, expected_owner=self.owner, lease_expires=None)
+            except Exception as e:
+                logging.error(f"Failed to release the lease on import job {job_id}: {str(e)}")
+        self.store.close()
+    
+    async def submit(self, file: UploadFile) -> Dict[str, Any]:
+        file_format = detect_format(file.filename)
+        job_id = str(uuid.uuid4())
+        file_path = os.path.join(self.job_dir, f"{job_id}{os.path.splitext(file.filename)[1].lower()}")
+        
+        await file.seek(0)
+        await asyncio.to_thread(self._copy_upload, file.file, file_path)
+        
+        now = datetime.utcnow().isoformat()
+        job = {
+            "job_id": job_id,
+            "filename": file.filename,
+            "file_path": file_path,
+            "file_format": file_format,
+            "file_size": os.path.getsize(file_path),
+            "batch_size": self.zendesk_service.batch_size,
+            "status": "queued",
+            "created_at": now,
+            "updated_at": now
+        }
+        await asyncio.to_thread(self.store.create, job)
+        self._queue.put_nowait(job_id)
+        return job
+    
+    def _copy_upload(self, source: BinaryIO, file_path: str):
+        os.makedirs(self.job_dir, exist_ok=True)
+        with open(file_path, "wb") as destination:
+            shutil.copyfileobj(source, destination, 1 << 20)
+    
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run_job(job_id)
+            except asyncio.CancelledError:
+                raise
+            except LeaseLostError as e:
+                logging.warning(str(e))
+            except Exception as e:
+                logging.error(f"Zendesk import job {job_id} failed: {str(e)}")
+                failed = await asyncio.to_thread(
+                    self.store.update, job_id, expected_owner=self.owner, status="failed", error=str(e),
+                    lease_expires=None, finished_at=datetime.utcnow().isoformat()
+                )
+                if failed:
+                    await self._remove_upload(job_id)
+            finally:
+                self._progress.pop(job_id, None)
+    
+    async def _remove_upload(self, job_id: str):
+        # A failed job is terminal, so its upload would otherwise stay on disk forever.
+        job = await asyncio.to_thread(self.store.get, job_id)
+        if job is not None:
+            try:
+                await asyncio.to_thread(os.remove, job["file_path"])
+            except FileNotFoundError:
+                pass
+    
+    async def _run_job(self, job_id: str):
+        if not await asyncio.to_thread(self.store.claim, job_id, self.owner, self.lease_seconds):
+            return
+        job = await asyncio.to_thread(self.store.get, job_id)
+        
+        with open(job["file_path"], "rb") as stream:
+            progress = JobProgress(self.store, job, stream, self.owner, self.lease_seconds)
+            self._progress[job_id] = progress
+            
+            # Batches before the checkpoint were fully stored by a previous run; re-parse
+            # and drop them so batch boundaries line up with the original numbering.
+            batches = iter_ticket_batches(
+                stream, job["file_format"], job["batch_size"], self.zendesk_service.max_record_bytes
+            )
+            progress.parsed_count = await asyncio.to_thread(
+                lambda: sum(len(batch) for batch in itertools.islice(batches, job["committed_batches"]))
+            )
+            
+            await self.zendesk_service.run_import_pipeline(
+                batches, progress=progress, start_batch=job["committed_batches"]
+            )
+        
+        completed = await asyncio.to_thread(
+            self.store.update,
+            job_id,
+            expected_owner=self.owner,
+            status="completed",
+            parsed=progress.parsed_count,
+            embedded=progress.embedded_count,
+            skipped=progress.skipped_count,
+            stored=progress.stored_count,
+            bytes_read=job["file_size"],
+            committed_batches=progress.committed_batches,
+            lease_expires=None,
+            finished_at=datetime.utcnow().isoformat()
+        )
+        if not completed:
+            raise LeaseLostError(f"Lost the lease on import job {job_id}")
+        await asyncio.to_thread(os.remove, job["file_path"])
+        logging.info(f"Zendesk import job {job_id} completed: {progress.stored_count} tickets")
+    
+    async def get_status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = await asyncio.to_thread(self.store.get, job_id)
+        if job is None:
+            return None
+        
+        progress = self._progress.get(job_id)
+        if progress is not None:
+            job.update(
+                parsed=progress.parsed_count,
+                embedded=progress.embedded_count,
+                skipped=progress.skipped_count,
+                stored=progress.stored_count,
+                bytes_read=progress.bytes_read
+            )
+        
+        elapsed = None
+        throughput = None
+        eta_seconds = None
+        if job["started_at"]:
+            end = datetime.fromisoformat(job["finished_at"]) if job["finished_at"] else datetime.utcnow()
+            elapsed = max((end - datetime.fromisoformat(job["started_at"])).total_seconds(), 1e-6)
+            throughput = job["stored"] / elapsed
+            if job["status"] == "running" and job["bytes_read"]:
+                remaining_bytes = max(job["file_size"] - job["bytes_read"], 0)
+                eta_seconds = elapsed * remaining_bytes / job["bytes_read"]
+        
+        return {
+            "job_id": job["job_id"],
+            "filename": job["filename"],
+            "status": job["status"],
+            "tickets_parsed": job["parsed"],
+            "tickets_embedded": job["embedded"],
+            "tickets_unchanged": job["skipped"],
+            "tickets_stored": job["stored"],
+            "bytes_read": job["bytes_read"],
+            "file_size": job["file_size"],
+            "committed_batches": job["committed_batches"],
+            "elapsed_seconds": elapsed,
+            "throughput_per_second": throughput,
+            "eta_seconds": eta_seconds,
+            "error": job["error"],
+            "created_at": job["created_at"],
+            "finished_at": job["finished_at"]
+        }
@@ -1,29 +1,139 @@
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 from langchain.schema import HumanMessage, SystemMessage
+import asyncio
+import httpx
+import openai
 import os
-from typing import List, Dict, Any
+import random
+from typing import List, Dict, Any, Awaitable, Callable, TypeVar
 import logging
+from app.services.embedding_cache import EmbeddingCache
+from app.services.rate_limiter import RateLimiter
+from app.services.embedding_backends import EmbeddingBackend, OpenAIEmbeddingBackend, HashingEmbeddingBackend, SentenceTransformerEmbeddingBackend
+
+T = TypeVar("T")
+
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError, openai.InternalServerError)
 
 class OpenAIService:
     def __init__(self):
         self.api_key = os.getenv("OPENAI_API_KEY")
         self.is_configured = self.api_key and self.api_key != "your_openai_api_key_here"
+        self.embedding_backend_name = os.getenv("EMBEDDING_BACKEND", "auto").lower()
+        if self.embedding_backend_name == "auto":
+            self.embedding_backend_name = "openai" if self.is_configured else "hashing"
+        self.embedding_model = os.getenv("EMBEDDING_MODEL", "text-embedding-ada-002")
+        self.embedding_dimensions = int(os.getenv("EMBEDDING_DIMENSIONS", "1536"))
+        # Only the text-embedding-3 family can shorten its output via the dimensions parameter.
+        self.supports_dimensions = self.embedding_model.startswith("text-embedding-3")
+        if self.embedding_backend_name == "openai" and not self.supports_dimensions and self.embedding_dimensions != 1536:
+            raise ValueError(f"{self.embedding_model} only produces 1536-dimensional embeddings")
+        self.embedding_cache = EmbeddingCache.from_env()
+        self.max_retries = int(os.getenv("OPENAI_MAX_RETRIES", "5"))
+        self.retry_base_delay = float(os.getenv("OPENAI_RETRY_BASE_DELAY", "0.5"))
+        self.retry_max_delay = float(os.getenv("OPENAI_RETRY_MAX_DELAY", "30"))
+        self.rate_limiter = RateLimiter(
+            max_concurrency=int(os.getenv("OPENAI_MAX_CONCURRENCY", "16")),
+            requests_per_minute=int(os.getenv("OPENAI_REQUESTS_PER_MINUTE", "0")) or None,
+            tokens_per_minute=int(os.getenv("OPENAI_TOKENS_PER_MINUTE", "0")) or None
+        )
+        self.retries = 0
+        self.http_client = None
         
         if self.is_configured:
+            # One keep-alive pool shared by the chat and embedding clients. Retries are
+            # handled by _call_with_retries so they go through the rate limiter.
+            self.http_client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=int(os.getenv("OPENAI_POOL_SIZE", "50")),
+                    max_keepalive_connections=int(os.getenv("OPENAI_POOL_KEEPALIVE", "20"))
+                ),
+                timeout=httpx.Timeout(float(os.getenv("OPENAI_TIMEOUT", "60")), connect=5.0)
+            )
+            
             self.chat_model = ChatOpenAI(
                 model="gpt-4",
                 temperature=0.7,
-                api_key=self.api_key
+                api_key=self.api_key,
+                http_async_client=self.http_client,
+                max_retries=0
             )
             
             self.embeddings = OpenAIEmbeddings(
-                model="text-embedding-ada-002",
-                api_key=self.api_key
+                model=self.embedding_model,
+                dimensions=self.embedding_dimensions if self.supports_dimensions else None,
+                api_key=self.api_key,
+                http_async_client=self.http_client,
+                max_retries=0
             )
         else:
             logging.warning("OpenAI API key not configured - AI features will use fallback responses")
             self.chat_model = None
             self.embeddings = None
+        
+        self.embedding_backend = self._create_embedding_backend()
+        logging.info(f"Using {self.embedding_backend.name} embeddings ({self.embedding_dimensions} dimensions)")
+    
+    def _create_embedding_backend(self) -> EmbeddingBackend:
+        workers = int(os.getenv("EMBEDDING_LOCAL_WORKERS", "2"))
+        batch_size = int(os.getenv("EMBEDDING_LOCAL_BATCH_SIZE", "64"))
+        if self.embedding_backend_name == "openai":
+            if not self.is_configured:
+                raise ValueError("EMBEDDING_BACKEND=openai requires OPENAI_API_KEY")
+            # Vectors of different lengths from the same model must not share cache entries.
+            cache_key = f"{self.embedding_model}:{self.embedding_dimensions}" if self.supports_dimensions else self.embedding_model
+            return OpenAIEmbeddingBackend(
+                cache_key, self.embedding_dimensions, self.embeddings, self._call_with_retries, self._estimate_tokens
+            )
+        if self.embedding_backend_name == "hashing":
+            return HashingEmbeddingBackend(f"hashing:{self.embedding_dimensions}", self.embedding_dimensions, workers, batch_size)
+        if self.embedding_backend_name == "sentence-transformers":
+            return SentenceTransformerEmbeddingBackend(
+                os.getenv("EMBEDDING_LOCAL_MODEL", "sentence-transformers/all-MiniLM-L6-v2"),
+                self.embedding_dimensions,
+                workers,
+                batch_size,
+                device=os.getenv("EMBEDDING_LOCAL_DEVICE") or None
+            )
+        raise ValueError(f"Unsupported EMBEDDING_BACKEND: {self.embedding_backend_name}")
+    
+    async def close(self):
+        await self.embedding_backend.close()
+        if self.http_client is not None:
+            await self.http_client.aclose()
+        self.embedding_cache.close()
+    
+    @staticmethod
+    def _estimate_tokens(*texts: str) -> int:
+        return sum(len(text) for text in texts) // 4 + 1
+    
+    def _retry_delay(self, attempt: int, error: Exception) -> float:
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                return min(self.retry_max_delay, float(retry_after))
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.retry_max_delay, self.retry_base_delay * (2 ** attempt)))
+    
+    async def _call_with_retries(self, call: Callable[[], Awaitable[T]], tokens: int) -> T:
+        attempt = 0
+        while True:
+            try:
+                async with self.rate_limiter.limit(tokens):
+                    return await call()
+            except RETRYABLE_ERRORS as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._retry_delay(attempt, e)
+                attempt += 1
+                self.retries += 1
+                logging.warning(f"OpenAI request failed ({type(e).__name__}), retrying in {delay:.2f}s (attempt {attempt}/{self.max_retries})")
+                await asyncio.sleep(delay)
+    
+    def stats(self) -> Dict[str, Any]:
+        return {"embedding_backend": self.embedding_backend.name, "retries": self.retries, **self.rate_limiter.stats()}
     
     async def generate_response(self, system_prompt: str, user_message: str, context: Dict[str, Any] = None) -> str:
         if not self.is_configured:
@@ -39,30 +149,40 @@ class OpenAIService:
                 context_message = f"Context: {context}"
                 messages.insert(1, SystemMessage(content=context_message))
             
-            response = await self.chat_model.ainvoke(messages)
+            response = await self._call_with_retries(
+                lambda: self.chat_model.ainvoke(messages),
+                tokens=self._estimate_tokens(*(message.content for message in messages))
+            )
             return response.content
         except Exception as e:
             logging.error(f"OpenAI generation error: {str(e)}")
             raise
     
     async def get_embedding(self, text: str) -> List[float]:
-        if not self.is_configured:
-            return [0.0] * 1536
-        
-        try:
-            embedding = await self.embeddings.aembed_query(text)
-            return embedding
-        except Exception as e:
-            logging.error(f"OpenAI embedding error: {str(e)}")
-            raise
+        embeddings = await self.get_embeddings_batch([text])
+        return embeddings[0]
     
     async def get_embeddings_batch(self, texts: List[str]) -> List[List[float]]:
-        if not self.is_configured:
-            return [[0.0] * 1536 for _ in texts]
-        
+        backend = self.embedding_backend
         try:
-            embeddings = await self.embeddings.aembed_documents(texts)
+            if not backend.cacheable:
+                return await backend.embed(texts)
+            
+            embeddings = await self.embedding_cache.get_many(backend.cache_key, texts)
+            missing_texts = list(dict.fromkeys(
+                text for text, embedding in zip(texts, embeddings) if embedding is None
+            ))
+            
+            if missing_texts:
+                computed = await backend.embed(missing_texts)
+                await self.embedding_cache.set_many(backend.cache_key, missing_texts, computed)
+                computed_by_text = dict(zip(missing_texts, computed))
+                embeddings = [
+                    embedding if embedding is not None else computed_by_text[text]
+                    for text, embedding in zip(texts, embeddings)
+                ]
+            
             return embeddings
         except Exception as e:
-            logging.error(f"OpenAI batch embedding error: {str(e)}")
+            logging.error(f"Embedding error ({backend.name}): {str(e)}")
             raise
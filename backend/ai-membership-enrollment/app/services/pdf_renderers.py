@@ -0,0 +1,348 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+import os
+import time
+import pdfkit
+
+def summary_sections(session_data: Dict[str, Any], current_date: str) -> List[Tuple[str, List[Tuple[str, str]]]]:
+    """The labelled fields of the summary in page order, matching the HTML template."""
+    return [
+        ("Personal Information", [
+            ("Full Name:", session_data.get('name', 'Not provided')),
+            ("Email Address:", session_data.get('email', 'Not provided')),
+            ("Company:", session_data.get('company', 'Not provided')),
+            ("Job Title:", session_data.get('job_title', 'Not provided'))
+        ]),
+        ("Membership Details", [
+            ("Program Type:", session_data.get('program_type', 'Not specified')),
+            ("How did you hear about us:", session_data.get('referral_source', 'Not provided'))
+        ]),
+        ("Enrollment Status", [
+            ("Status:", session_data.get('status', 'In Progress')),
+            ("Completion Date:", session_data.get('completion_date', current_date))
+        ])
+    ]
+
+FOOTER_LINES = [
+    "This document was automatically generated by the AI Membership Enrollment System.",
+    "For questions or support, please contact our membership team."
+]
+
+class PDFRenderer:
+    """Writes the enrollment summary for one session to a PDF file."""
+    
+    name = "base"
+    
+    def render(self, session_data: Dict[str, Any], session_id: str, pdf_path: str):
+        raise NotImplementedError
+    
+    def render_bytes(self, session_data: Dict[str, Any], session_id: str) -> bytes:
+        raise NotImplementedError
+
+class PdfkitRenderer(PDFRenderer):
+    """HTML template rendered by a wkhtmltopdf subprocess."""
+    
+    name = "pdfkit"
+    
+    def __init__(self):
+        self.options = {
+            'page-size': 'A4',
+            'margin-top': '0.75in',
+            'margin-right': '0.75in',
+            'margin-bottom': '0.75in',
+            'margin-left': '0.75in',
+            'encoding': "UTF-8",
+            'no-outline': None
+        }
+    
+    def render(self, session_data: Dict[str, Any], session_id: str, pdf_path: str):
+        html_content = self._create_html_template(session_data, session_id)
+        pdfkit.from_string(html_content, pdf_path, options=self.options)
+    
+    def render_bytes(self, session_data: Dict[str, Any], session_id: str) -> bytes:
+        html_content = self._create_html_template(session_data, session_id)
+        return pdfkit.from_string(html_content, False, options=self.options)
+    
+    def _create_html_template(self, session_data: Dict[str, Any], session_id: str) -> str:
+        current_date = datetime.utcnow().strftime("%B %d, %Y")
+        
+        html_template = f"""
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <meta charset="UTF-8">
+            <title>Membership Enrollment Summary</title>
+            <style>
+                body {{
+                    font-family: Arial, sans-serif;
+                    line-height: 1.6;
+                    color: #333;
+                    max-width: 800px;
+                    margin: 0 auto;
+                    padding: 20px;
+                }}
+                .header {{
+                    text-align: center;
+                    border-bottom: 2px solid #007bff;
+                    padding-bottom: 20px;
+                    margin-bottom: 30px;
+                }}
+                .section {{
+                    margin-bottom: 25px;
+                }}
+                .section h3 {{
+                    color: #007bff;
+                    border-bottom: 1px solid #ddd;
+                    padding-bottom: 5px;
+                }}
+                .info-row {{
+                    display: flex;
+                    justify-content: space-between;
+                    margin-bottom: 10px;
+                    padding: 8px;
+                    background-color: #f8f9fa;
+                    border-radius: 4px;
+                }}
+                .label {{
+                    font-weight: bold;
+                    color: #495057;
+                }}
+                .value {{
+                    color: #212529;
+                }}
+                .footer {{
+                    text-align: center;
+                    margin-top: 40px;
+                    padding-top: 20px;
+                    border-top: 1px solid #ddd;
+                    color: #6c757d;
+                    font-size: 12px;
+                }}
+            </style>
+        </head>
+        <body>
+            <div class="header">
+                <h1>Membership Enrollment Summary</h1>
+                <p>Generated on {current_date}</p>
+                <p>Session ID: {session_id}</p>
+            </div>
+            
+            <div class="section">
+                <h3>Personal Information</h3>
+                <div class="info-row">
+                    <span class="label">Full Name:</span>
+                    <span class="value">{session_data.get('name', 'Not provided')}</span>
+                </div>
+                <div class="info-row">
+                    <span class="label">Email Address:</span>
+                    <span class="value">{session_data.get('email', 'Not provided')}</span>
+                </div>
+                <div class="info-row">
+                    <span class="label">Company:</span>
+                    <span class="value">{session_data.get('company', 'Not provided')}</span>
+                </div>
+                <div class="info-row">
+                    <span class="label">Job Title:</span>
+                    <span class="value">{session_data.get('job_title', 'Not provided')}</span>
+                </div>
+            </div>
+            
+            <div class="section">
+                <h3>Membership Details</h3>
+                <div class="info-row">
+                    <span class="label">Program Type:</span>
+                    <span class="value">{session_data.get('program_type', 'Not specified')}</span>
+                </div>
+                <div class="info-row">
+                    <span class="label">How did you hear about us:</span>
+                    <span class="value">{session_data.get('referral_source', 'Not provided')}</span>
+                </div>
+            </div>
+            
+            <div class="section">
+                <h3>Enrollment Status</h3>
+                <div class="info-row">
+                    <span class="label">Status:</span>
+                    <span class="value">{session_data.get('status', 'In Progress')}</span>
+                </div>
+                <div class="info-row">
+                    <span class="label">Completion Date:</span>
+                    <span class="value">{session_data.get('completion_date', current_date)}</span>
+                </div>
+            </div>
+            
+            <div class="footer">
+                <p>This document was automatically generated by the AI Membership Enrollment System.</p>
+                <p>For questions or support, please contact our membership team.</p>
+            </div>
+        </body>
+        </html>
+        """
+        
+        return html_template
+
+class FPDFRenderer(PDFRenderer):
+    """Draws the same one-page layout in-process with fpdf2: no subprocess and no HTML engine.
+    
+    The built-in Helvetica only covers Latin-1; set PDF_FONT_PATH (and PDF_FONT_BOLD_PATH)
+    to TrueType fonts such as DejaVuSans to render any Unicode text, otherwise other
+    characters print as "?".
+    """
+    
+    name = "fpdf"
+    
+    BLUE = (0, 123, 255)
+    TEXT = (51, 51, 51)
+    LABEL = (73, 80, 87)
+    MUTED = (108, 117, 125)
+    ROW_FILL = (248, 249, 250)
+    RULE = (221, 221, 221)
+    MARGIN = 19.05  # 0.75in in mm, as in the pdfkit options
+    
+    def __init__(self, font_path: Optional[str] = None, bold_font_path: Optional[str] = None):
+        try:
+            from fpdf import FPDF
+        except ImportError as e:
+            raise ImportError("PDF_RENDERER=fpdf requires the fpdf2 package (poetry install --extras pdf-inprocess)") from e
+        self._fpdf = FPDF
+        self.font_path = font_path
+        self.bold_font_path = bold_font_path or font_path
+        self.family = "Summary" if font_path else "Helvetica"
+    
+    def _new_document(self):
+        pdf = self._fpdf(format="A4", unit="mm")
+        pdf.set_margins(self.MARGIN, self.MARGIN, self.MARGIN)
+        pdf.set_auto_page_break(True, margin=self.MARGIN)
+        pdf.set_title("Membership Enrollment Summary")
+        pdf.set_creator("AI Membership Enrollment System")
+        if self.font_path:
+            pdf.add_font("Summary", "", self.font_path)
+            pdf.add_font("Summary", "B", self.bold_font_path)
+        pdf.add_page()
+        return pdf
+    
+    def _text(self, value: Any) -> str:
+        text = str(value)
+        if self.font_path:
+            return text
+        return text.encode("latin-1", "replace").decode("latin-1")
+    
+    def render(self, session_data: Dict[str, Any], session_id: str, pdf_path: str):
+        self._draw(session_data, session_id).output(pdf_path)
+    
+    def render_bytes(self, session_data: Dict[str, Any], session_id: str) -> bytes:
+        return bytes(self._draw(session_data, session_id).output())
+    
+    def _draw(self, session_data: Dict[str, Any], session_id: str):
+        current_date = datetime.utcnow().strftime("%B %d, %Y")
+        pdf = self._new_document()
+        family = self.family
+        width = pdf.epw
+        
+        pdf.set_text_color(*self.TEXT)
+        pdf.set_font(family, "B", 20)
+        pdf.cell(width, 12, "Membership Enrollment Summary", align="C", new_x="LMARGIN", new_y="NEXT")
+        pdf.set_font(family, "", 10)
+        pdf.cell(width, 6, self._text(f"Generated on {current_date}"), align="C", new_x="LMARGIN", new_y="NEXT")
+        pdf.cell(width, 6, self._text(f"Session ID: {session_id}"), align="C", new_x="LMARGIN", new_y="NEXT")
+        pdf.ln(4)
+        pdf.set_draw_color(*self.BLUE)
+        pdf.set_line_width(0.6)
+        pdf.line(self.MARGIN, pdf.get_y(), self.MARGIN + width, pdf.get_y())
+        pdf.ln(8)
+        
+        for title, rows in summary_sections(session_data, current_date):
+            pdf.set_text_color(*self.BLUE)
+            pdf.set_font(family, "B", 13)
+            pdf.cell(width, 8, title, new_x="LMARGIN", new_y="NEXT")
+            pdf.set_draw_color(*self.RULE)
+            pdf.set_line_width(0.2)
+            pdf.line(self.MARGIN, pdf.get_y(), self.MARGIN + width, pdf.get_y())
+            pdf.ln(3)
+            
+            pdf.set_fill_color(*self.ROW_FILL)
+            for label, value in rows:
+                y = pdf.get_y()
+                pdf.rect(self.MARGIN, y, width, 8, style="F")
+                pdf.set_xy(self.MARGIN + 2, y)
+                pdf.set_text_color(*self.LABEL)
+                pdf.set_font(family, "B", 10)
+                pdf.cell(width / 2 - 2, 8, label)
+                pdf.set_text_color(33, 37, 41)
+                pdf.set_font(family, "", 10)
+                pdf.cell(width / 2 - 2, 8, self._text(value), align="R", new_x="LMARGIN", new_y="NEXT")
+                pdf.ln(2)
+            pdf.ln(5)
+        
+        pdf.ln(8)
+        pdf.set_draw_color(*self.RULE)
+        pdf.line(self.MARGIN, pdf.get_y(), self.MARGIN + width, pdf.get_y())
+        pdf.ln(5)
+        pdf.set_text_color(*self.MUTED)
+        pdf.set_font(family, "", 8)
+        for line in FOOTER_LINES:
+            pdf.cell(width, 5, line, align="C", new_x="LMARGIN", new_y="NEXT")
+        return pdf
+
+def create_renderer(name: str) -> PDFRenderer:
+    if name == "pdfkit":
+        return PdfkitRenderer()
+    if name == "fpdf":
+        return FPDFRenderer(
+            font_path=os.getenv("PDF_FONT_PATH") or None,
+            bold_font_path=os.getenv("PDF_FONT_BOLD_PATH") or None
+        )
+    raise ValueError(f"Unsupported PDF_RENDERER: {name}")
+
+def benchmark_renderer(renderer: PDFRenderer, count: int, workers: int, output_dir: str) -> Dict[str, Any]:
+    """Render `count` distinct summaries with render_bytes, the path PDFService and the
+    export use, one at a time (latency) and across a pool of `workers` threads
+    (throughput); then once more to files in output_dir for comparison."""
+    documents = [
+        ({
+            "name": f"Member {index}",
+            "email": f"member{index}@example.com",
+            "company": "Example Corp",
+            "job_title": "Engineer",
+            "program_type": "premium",
+            "referral_source": "conference",
+            "status": "completed"
+        }, f"bench-{index}")
+        for index in range(count)
+    ]
+    
+    sizes = [0] * count
+    
+    def render_bytes(index: int) -> float:
+        session_data, session_id = documents[index]
+        started = time.perf_counter()
+        sizes[index] = len(renderer.render_bytes(session_data, session_id))
+        return time.perf_counter() - started
+    
+    def render_file(index: int) -> float:
+        session_data, session_id = documents[index]
+        started = time.perf_counter()
+        renderer.render(session_data, session_id, os.path.join(output_dir, f"{session_id}.pdf"))
+        return time.perf_counter() - started
+    
+    latencies = sorted(render_bytes(index) for index in range(count))
+    
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(render_bytes, range(count)))
+    elapsed = time.perf_counter() - started
+    
+    file_latencies = [render_file(index) for index in range(count)]
+    
+    return {
+        "renderer": renderer.name,
+        "documents": count,
+        "latency_ms_mean": 1000 * sum(latencies) / count,
+        "latency_ms_p50": 1000 * latencies[count // 2],
+        "latency_ms_p95": 1000 * latencies[min(count - 1, int(count * 0.95))],
+        "workers": workers,
+        "throughput_per_second": count / elapsed,
+        "file_latency_ms_mean": 1000 * sum(file_latencies) / count,
+        "average_bytes": sum(sizes) / count
+    }
@@ -1,152 +1,102 @@
-import pdfkit
 import os
-from typing import Dict, Any
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional
+import asyncio
+import hashlib
+import json
 import tempfile
 import logging
+from app.services.artifact_store import ArtifactStore
+from app.services.pdf_renderers import create_renderer
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or any(candidate.removeprefix("W/") == f'"{etag}"' for candidate in candidates)
 
 class PDFService:
+    """Renders enrollment summaries off the event loop and keeps recent PDFs in an ArtifactStore.
+    
+    Artifacts are keyed by session and a hash of the collected data, so an unchanged
+    session is served from the stored copy; the key doubles as the ETag.
+    """
+    
     def __init__(self):
-        self.options = {
-            'page-size': 'A4',
-            'margin-top': '0.75in',
-            'margin-right': '0.75in',
-            'margin-bottom': '0.75in',
-            'margin-left': '0.75in',
-            'encoding': "UTF-8",
-            'no-outline': None
-        }
+        self.renderer = create_renderer(os.getenv("PDF_RENDERER", "pdfkit"))
+        self.store = ArtifactStore(
+            directory=os.getenv("PDF_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "enrollment_summaries"),
+            max_bytes=int(os.getenv("PDF_CACHE_MAX_BYTES", str(256 * 1024 * 1024))),
+            max_entries=int(os.getenv("PDF_CACHE_MAX_ENTRIES", "1000")),
+            ttl=float(os.getenv("PDF_CACHE_TTL", "86400")),
+            memory_max_bytes=int(os.getenv("PDF_MEMORY_MAX_BYTES", "65536")),
+            suffix=".pdf"
+        )
+        # wkhtmltopdf runs as a subprocess and fpdf renders take milliseconds, so threads are
+        # enough to keep renders off the loop; the pool size bounds how many run at once.
+        self._executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv("PDF_RENDER_WORKERS", "2")), thread_name_prefix="pdf-render"
+        )
+        self._rendering: Dict[str, asyncio.Future] = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+    
+    def summary_etag(self, session_data: Dict[str, Any], session_id: str) -> str:
+        # The renderer is part of the key: switching it changes the document.
+        content = json.dumps(session_data, sort_keys=True, default=str)
+        return hashlib.sha256(f"{self.renderer.name}\x00{session_id}\x00{content}".encode("utf-8")).hexdigest()
+    
+    async def render_summary(self, session_data: Dict[str, Any], session_id: str) -> Dict[str, Any]:
+        """Return {"etag", "path", "body", "size"} for the summary, rendering it only on a miss.
+        Small PDFs come back as an in-memory body with path None, larger ones as a file."""
+        etag = self.summary_etag(session_data, session_id)
+        artifact = self.store.get(etag)
+        if artifact is not None:
+            self.cache_hits += 1
+            return {**artifact, "etag": etag}
+        
+        # Concurrent requests for the same session state share one render, which runs as its
+        # own task so a client disconnecting does not cancel it for the others.
+        pending = self._rendering.get(etag)
+        if pending is None:
+            self.cache_misses += 1
+            pending = asyncio.create_task(self._render(session_data, session_id, etag))
+            self._rendering[etag] = pending
+            pending.add_done_callback(lambda _: self._rendering.pop(etag, None))
+        else:
+            self.cache_hits += 1
+        return await asyncio.shield(pending)
     
-    def generate_enrollment_summary(self, session_data: Dict[str, Any], session_id: str) -> str:
+    async def _render(self, session_data: Dict[str, Any], session_id: str, etag: str) -> Dict[str, Any]:
         try:
-            html_content = self._create_html_template(session_data, session_id)
-            
-            temp_dir = tempfile.gettempdir()
-            pdf_filename = f"enrollment_summary_{session_id}.pdf"
-            pdf_path = os.path.join(temp_dir, pdf_filename)
-            
-            pdfkit.from_string(html_content, pdf_path, options=self.options)
-            
-            logging.info(f"PDF generated successfully: {pdf_path}")
-            return pdf_path
+            artifact = await asyncio.get_running_loop().run_in_executor(
+                self._executor, self._render_to_store, session_data, session_id, etag
+            )
         except Exception as e:
             logging.error(f"PDF generation error: {str(e)}")
             raise
+        return {**artifact, "etag": etag}
     
-    def _create_html_template(self, session_data: Dict[str, Any], session_id: str) -> str:
-        current_date = datetime.utcnow().strftime("%B %d, %Y")
-        
-        html_template = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="UTF-8">
-            <title>Membership Enrollment Summary</title>
-            <style>
-                body {{
-                    font-family: Arial, sans-serif;
-                    line-height: 1.6;
-                    color: #333;
-                    max-width: 800px;
-                    margin: 0 auto;
-                    padding: 20px;
-                }}
-                .header {{
-                    text-align: center;
-                    border-bottom: 2px solid #007bff;
-                    padding-bottom: 20px;
-                    margin-bottom: 30px;
-                }}
-                .section {{
-                    margin-bottom: 25px;
-                }}
-                .section h3 {{
-                    color: #007bff;
-                    border-bottom: 1px solid #ddd;
-                    padding-bottom: 5px;
-                }}
-                .info-row {{
-                    display: flex;
-                    justify-content: space-between;
-                    margin-bottom: 10px;
-                    padding: 8px;
-                    background-color: #f8f9fa;
-                    border-radius: 4px;
-                }}
-                .label {{
-                    font-weight: bold;
-                    color: #495057;
-                }}
-                .value {{
-                    color: #212529;
-                }}
-                .footer {{
-                    text-align: center;
-                    margin-top: 40px;
-                    padding-top: 20px;
-                    border-top: 1px solid #ddd;
-                    color: #6c757d;
-                    font-size: 12px;
-                }}
-            </style>
-        </head>
-        <body>
-            <div class="header">
-                <h1>Membership Enrollment Summary</h1>
-                <p>Generated on {current_date}</p>
-                <p>Session ID: {session_id}</p>
-            </div>
-            
-            <div class="section">
-                <h3>Personal Information</h3>
-                <div class="info-row">
-                    <span class="label">Full Name:</span>
-                    <span class="value">{session_data.get('name', 'Not provided')}</span>
-                </div>
-                <div class="info-row">
-                    <span class="label">Email Address:</span>
-                    <span class="value">{session_data.get('email', 'Not provided')}</span>
-                </div>
-                <div class="info-row">
-                    <span class="label">Company:</span>
-                    <span class="value">{session_data.get('company', 'Not provided')}</span>
-                </div>
-                <div class="info-row">
-                    <span class="label">Job Title:</span>
-                    <span class="value">{session_data.get('job_title', 'Not provided')}</span>
-                </div>
-            </div>
-            
-            <div class="section">
-                <h3>Membership Details</h3>
-                <div class="info-row">
-                    <span class="label">Program Type:</span>
-                    <span class="value">{session_data.get('program_type', 'Not specified')}</span>
-                </div>
-                <div class="info-row">
-                    <span class="label">How did you hear about us:</span>
-                    <span class="value">{session_data.get('referral_source', 'Not provided')}</span>
-                </div>
-            </div>
-            
-            <div class="section">
-                <h3>Enrollment Status</h3>
-                <div class="info-row">
-                    <span class="label">Status:</span>
-                    <span class="value">{session_data.get('status', 'In Progress')}</span>
-                </div>
-                <div class="info-row">
-                    <span class="label">Completion Date:</span>
-                    <span class="value">{session_data.get('completion_date', current_date)}</span>
-                </div>
-            </div>
-            
-            <div class="footer">
-                <p>This document was automatically generated by the AI Membership Enrollment System.</p>
-                <p>For questions or support, please contact our membership team.</p>
-            </div>
-        </body>
-        </html>
-        """
-        
-        return html_template
+    def _render_to_store(self, session_data: Dict[str, Any], session_id: str, etag: str) -> Dict[str, Any]:
+        artifact = self.store.put(etag, self.renderer.render_bytes(session_data, session_id))
+        logging.info(f"PDF generated successfully: {artifact['path'] or 'in memory'} ({artifact['size']} bytes)")
+        return artifact
+    
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.cache_hits + self.cache_misses
+        store_stats = self.store.stats()
+        return {
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "cache_hit_rate": self.cache_hits / lookups if lookups else 0.0,
+            "cache_entries": store_stats["entries"],
+            "cache_memory_entries": store_stats["memory_entries"],
+            "cache_bytes": store_stats["bytes"],
+            "cache_evicted": store_stats["evicted"],
+            "cache_expired": store_stats["expired"],
+            "renderer": self.renderer.name,
+            "rendering": len(self._rendering)
+        }
+    
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -1,37 +1,172 @@
-from presidio_analyzer import AnalyzerEngine
+from presidio_analyzer import AnalyzerEngine, BatchAnalyzerEngine, RecognizerRegistry
+from presidio_analyzer.nlp_engine import NlpEngineProvider
 from presidio_anonymizer import AnonymizerEngine
-from typing import Dict, List, Any
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Any, Optional, Tuple
+import asyncio
+import hashlib
 import logging
+import multiprocessing
+import os
+import re
+import threading
+from app.models.enrollment import ProgramType, TicketStatus, TicketPriority
+
+# Values that cannot carry PII on their own: short numbers, ISO dates/timestamps and
+# booleans. They skip the NLP pipeline.
+NO_PII_PATTERN = re.compile(
+    r"\s*(?:"
+    r"[-+]?\d{1,6}(?:\.\d+)?"
+    r"|\d{4}-\d{2}-\d{2}(?:[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:Z|[+-]\d{2}:?\d{2})?)?"
+    r"|(?i:true|false|yes|no|none|null)"
+    r")?\s*"
+)
+
+# Enum codes skip it too, but only from this closed list: any other word may be a
+# lowercase name, a handle or an address.
+NO_PII_VALUES = frozenset(
+    [member.value for enum in (ProgramType, TicketStatus, TicketPriority) for member in enum] + ["mp"]
+)
+
+def configured_entities() -> Optional[List[str]]:
+    entities = [entity.strip() for entity in os.getenv("PII_ENTITIES", "").split(",") if entity.strip()]
+    return entities or None
+
+def _build_engines() -> Tuple[AnalyzerEngine, AnonymizerEngine]:
+    """Load the spaCy model named by PII_SPACY_MODEL and only the recognizers for PII_ENTITIES."""
+    nlp_engine = NlpEngineProvider(nlp_configuration={
+        "nlp_engine_name": "spacy",
+        "models": [{"lang_code": "en", "model_name": os.getenv("PII_SPACY_MODEL", "en_core_web_lg")}]
+    }).create_engine()
+    
+    registry = RecognizerRegistry()
+    registry.load_predefined_recognizers(nlp_engine=nlp_engine, languages=["en"])
+    entities = configured_entities()
+    if entities:
+        registry.recognizers = [
+            recognizer for recognizer in registry.recognizers
+            if set(recognizer.supported_entities) & set(entities)
+        ]
+    
+    return AnalyzerEngine(registry=registry, nlp_engine=nlp_engine, supported_languages=["en"]), AnonymizerEngine()
+
+# Engines owned by a pool worker process, built once by _init_worker.
+_worker_analyzer: Optional[BatchAnalyzerEngine] = None
+_worker_anonymizer: Optional[AnonymizerEngine] = None
+
+def _init_worker():
+    global _worker_analyzer, _worker_anonymizer
+    analyzer, _worker_anonymizer = _build_engines()
+    _worker_analyzer = BatchAnalyzerEngine(analyzer_engine=analyzer)
+
+def _scrub_result(anonymizer: AnonymizerEngine, text: str, results) -> Dict[str, Any]:
+    return {
+        "entities": [
+            {"entity_type": result.entity_type, "start": result.start, "end": result.end, "score": result.score}
+            for result in results
+        ],
+        "text": anonymizer.anonymize(text=text, analyzer_results=results).text if results else text
+    }
+
+def _worker_scrub(texts: List[str], batch_size: int, entities: Optional[List[str]]) -> List[Dict[str, Any]]:
+    # analyze_iterator runs the texts through spaCy's nlp.pipe in batches.
+    batch_results = _worker_analyzer.analyze_iterator(texts, language="en", batch_size=batch_size, entities=entities)
+    return [_scrub_result(_worker_anonymizer, text, results) for text, results in zip(texts, batch_results)]
 
 class PIIService:
-    def __init__(self):
-        self.analyzer = AnalyzerEngine()
-        self.anonymizer = AnonymizerEngine()
+    """Presidio engines are loaded on first use (or by warm_up), not at construction,
+    so importing the app does not pay for loading a spaCy model."""
+    
+    def __init__(self, entities: Optional[List[str]] = None):
+        self._analyzer: Optional[AnalyzerEngine] = None
+        self._anonymizer: Optional[AnonymizerEngine] = None
+        self._engines_lock = threading.Lock()
+        self.entities = entities if entities is not None else configured_entities()
+        self.workers = int(os.getenv("PII_WORKERS", "0")) or os.cpu_count() or 1
+        self.batch_size = int(os.getenv("PII_BATCH_SIZE", "32"))
+        self.cache_max_entries = int(os.getenv("PII_CACHE_MAX_ENTRIES", "10000"))
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.prescreened = 0
+    
+    @property
+    def ready(self) -> bool:
+        return self._analyzer is not None
+    
+    def _load_engines(self):
+        with self._engines_lock:
+            if self._analyzer is None:
+                logging.info(f"Loading PII engines (spaCy model {os.getenv('PII_SPACY_MODEL', 'en_core_web_lg')})")
+                analyzer, anonymizer = _build_engines()
+                # Assign the analyzer last: it is what `ready` and the fast path check.
+                self._anonymizer = anonymizer
+                self._analyzer = analyzer
+    
+    @property
+    def analyzer(self) -> AnalyzerEngine:
+        if self._analyzer is None:
+            self._load_engines()
+        return self._analyzer
+    
+    @property
+    def anonymizer(self) -> AnonymizerEngine:
+        if self._analyzer is None:
+            self._load_engines()
+        return self._anonymizer
+    
+    async def warm_up(self):
+        """Load the engines in a thread so startup and /healthz are not blocked."""
+        try:
+            await asyncio.to_thread(self._load_engines)
+            logging.info("PII engines loaded")
+        except Exception as e:
+            logging.error(f"PII warm-up failed: {str(e)}")
+    
+    def _cache_key(self, text: str) -> str:
+        entity_config = ",".join(sorted(self.entities)) if self.entities else "*"
+        return hashlib.sha256(f"{entity_config}\x00{text}".encode("utf-8")).hexdigest()
+    
+    def _lookup(self, text: str) -> Tuple[str, Optional[Dict[str, Any]]]:
+        if text.strip().lower() in NO_PII_VALUES or (len(text) <= 64 and NO_PII_PATTERN.fullmatch(text)):
+            self.prescreened += 1
+            return "", {"entities": [], "text": text}
+        key = self._cache_key(text)
+        result = self._cache.get(key)
+        if result is not None:
+            self._cache.move_to_end(key)
+            self.cache_hits += 1
+        else:
+            self.cache_misses += 1
+        return key, result
+    
+    def _remember(self, key: str, result: Dict[str, Any]):
+        self._cache[key] = result
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_max_entries:
+            self._cache.popitem(last=False)
+    
+    def scrub_text(self, text: str) -> Dict[str, Any]:
+        """Detect and anonymize in one analyzer pass: {"entities": [...], "text": anonymized}."""
+        key, result = self._lookup(text)
+        if result is None:
+            results = self.analyzer.analyze(text=text, language='en', entities=self.entities)
+            result = _scrub_result(self.anonymizer, text, results)
+            self._remember(key, result)
+        return result
     
     def detect_pii(self, text: str) -> List[Dict[str, Any]]:
         try:
-            results = self.analyzer.analyze(text=text, language='en')
-            return [
-                {
-                    "entity_type": result.entity_type,
-                    "start": result.start,
-                    "end": result.end,
-                    "score": result.score
-                }
-                for result in results
-            ]
+            return self.scrub_text(text)["entities"]
         except Exception as e:
             logging.error(f"PII detection error: {str(e)}")
             return []
     
     def anonymize_text(self, text: str) -> str:
         try:
-            analyzer_results = self.analyzer.analyze(text=text, language='en')
-            anonymized_result = self.anonymizer.anonymize(
-                text=text,
-                analyzer_results=analyzer_results
-            )
-            return anonymized_result.text
+            return self.scrub_text(text)["text"]
         except Exception as e:
             logging.error(f"PII anonymization error: {str(e)}")
             return text
@@ -51,3 +186,101 @@ class PIIService:
             else:
                 cleaned_data[key] = value
         return cleaned_data
+    
+    def _pool(self) -> ProcessPoolExecutor:
+        # spawn rather than fork: the parent runs an event loop and client threads that
+        # must not be duplicated into the workers.
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker
+            )
+        return self._executor
+    
+    async def scrub_batch(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """scrub_text for many texts. Cached and pre-screened texts are answered locally;
+        the rest are split into one chunk per worker and analyzed in the pool, in order."""
+        results: List[Optional[Dict[str, Any]]] = []
+        pending: Dict[str, List[int]] = {}
+        keys: Dict[str, str] = {}
+        for index, text in enumerate(texts):
+            key, result = self._lookup(text)
+            results.append(result)
+            if result is None:
+                pending.setdefault(text, []).append(index)
+                keys[text] = key
+        
+        if pending:
+            misses = list(pending)
+            chunk_size = max(1, min(self.batch_size * 4, -(-len(misses) // self.workers)))
+            loop = asyncio.get_running_loop()
+            chunks = await asyncio.gather(*[
+                loop.run_in_executor(
+                    self._pool(), _worker_scrub, misses[start:start + chunk_size], self.batch_size, self.entities
+                )
+                for start in range(0, len(misses), chunk_size)
+            ])
+            for text, result in zip(misses, (result for chunk in chunks for result in chunk)):
+                self._remember(keys[text], result)
+                for index in pending[text]:
+                    results[index] = result
+        
+        return results
+    
+    async def analyze_batch(self, texts: List[str]) -> List[List[Dict[str, Any]]]:
+        return [result["entities"] for result in await self.scrub_batch(texts)]
+    
+    async def anonymize_batch(self, texts: List[str]) -> List[str]:
+        try:
+            return [result["text"] for result in await self.scrub_batch(texts)]
+        except Exception as e:
+            logging.error(f"PII batch anonymization error: {str(e)}")
+            raise
+    
+    async def strip_pii_batch(self, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """strip_pii_from_data for many records, with every string field anonymized in one batch."""
+        texts: List[str] = []
+        for record in records:
+            self._collect_strings(record, texts)
+        
+        unique_texts = list(dict.fromkeys(texts))
+        anonymized = dict(zip(unique_texts, await self.anonymize_batch(unique_texts)))
+        return [self._replace_strings(record, anonymized) for record in records]
+    
+    def _collect_strings(self, data: Dict[str, Any], texts: List[str]):
+        for value in data.values():
+            if isinstance(value, str):
+                texts.append(value)
+            elif isinstance(value, dict):
+                self._collect_strings(value, texts)
+            elif isinstance(value, list):
+                texts.extend(item for item in value if isinstance(item, str))
+    
+    def _replace_strings(self, data: Dict[str, Any], anonymized: Dict[str, str]) -> Dict[str, Any]:
+        cleaned_data = {}
+        for key, value in data.items():
+            if isinstance(value, str):
+                cleaned_data[key] = anonymized[value]
+            elif isinstance(value, dict):
+                cleaned_data[key] = self._replace_strings(value, anonymized)
+            elif isinstance(value, list):
+                cleaned_data[key] = [anonymized[item] if isinstance(item, str) else item for item in value]
+            else:
+                cleaned_data[key] = value
+        return cleaned_data
+    
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.cache_hits + self.cache_misses
+        return {
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "cache_hit_rate": self.cache_hits / lookups if lookups else 0.0,
+            "cache_entries": len(self._cache),
+            "prescreened": self.prescreened
+        }
+    
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,65 @@
+from contextlib import asynccontextmanager
+from typing import Dict, Any, Optional
+import asyncio
+import time
+
+class TokenBucket:
+    def __init__(self, capacity_per_minute: int):
+        self.capacity = float(capacity_per_minute)
+        self.refill_rate = capacity_per_minute / 60.0
+        self.available = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+    
+    def _refill(self):
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self.updated_at) * self.refill_rate)
+        self.updated_at = now
+    
+    async def take(self, amount: float) -> float:
+        # Requests larger than the whole bucket are clamped so they can still run.
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.available >= amount:
+                    self.available -= amount
+                    return waited
+                delay = (amount - self.available) / self.refill_rate
+                await asyncio.sleep(delay)
+                waited += delay
+
+class RateLimiter:
+    """Bounds concurrent requests and enforces requests- and tokens-per-minute budgets."""
+    
+    def __init__(self, max_concurrency: int = 16, requests_per_minute: Optional[int] = None, tokens_per_minute: Optional[int] = None):
+        self.max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self._tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.in_flight = 0
+        self.acquired = 0
+        self.throttled_seconds = 0.0
+    
+    @asynccontextmanager
+    async def limit(self, tokens: int = 0):
+        async with self._semaphore:
+            if self._requests is not None:
+                self.throttled_seconds += await self._requests.take(1)
+            if self._tokens is not None and tokens:
+                self.throttled_seconds += await self._tokens.take(tokens)
+            self.in_flight += 1
+            self.acquired += 1
+            try:
+                yield
+            finally:
+                self.in_flight -= 1
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "acquired": self.acquired,
+            "throttled_seconds": round(self.throttled_seconds, 3)
+        }
@@ -0,0 +1,129 @@
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, Any, List, Optional, AsyncIterator, Deque, Tuple
+import asyncio
+import collections
+import json
+import logging
+import multiprocessing
+import os
+import re
+import zipfile
+from app.database.qdrant_client import QdrantManager
+from app.services.pdf_renderers import PDFRenderer, create_renderer
+
+# Renderer owned by a pool worker process, built once by _init_worker.
+_worker_renderer: Optional[PDFRenderer] = None
+
+def _init_worker(renderer_name: str):
+    global _worker_renderer
+    _worker_renderer = create_renderer(renderer_name)
+
+def _worker_render(session_data: Dict[str, Any], session_id: str) -> bytes:
+    return _worker_renderer.render_bytes(session_data, session_id)
+
+def archive_name(session_id: str) -> str:
+    return f"enrollment_summary_{re.sub(r'[^A-Za-z0-9_.-]', '_', session_id)}.pdf"
+
+class ZipStreamBuffer:
+    """Write-only sink for ZipFile.
+    
+    Without seek/tell, zipfile writes each entry's sizes in a trailing data descriptor
+    instead of going back to patch the header, so the archive can be sent as it is
+    built and only the entries not yet drained are held in memory.
+    """
+    
+    def __init__(self):
+        self._chunks: List[bytes] = []
+    
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+    
+    def flush(self):
+        pass
+    
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+class SummaryExporter:
+    """Streams a ZIP of summary PDFs for completed sessions, rendered across a process pool."""
+    
+    def __init__(self, qdrant_manager: QdrantManager):
+        self.qdrant_manager = qdrant_manager
+        self.renderer_name = os.getenv("PDF_RENDERER", "pdfkit")
+        self.workers = int(os.getenv("PDF_EXPORT_WORKERS", "0")) or os.cpu_count() or 1
+        self.batch_size = int(os.getenv("PDF_EXPORT_BATCH_SIZE", "64"))
+        self._executor: Optional[ProcessPoolExecutor] = None
+    
+    def _pool(self) -> ProcessPoolExecutor:
+        # spawn rather than fork, as in PIIService: the parent runs an event loop and client threads.
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.renderer_name,)
+            )
+        return self._executor
+    
+    async def export_zip(self, since: Optional[datetime] = None, until: Optional[datetime] = None) -> AsyncIterator[bytes]:
+        """Yield the archive in chunks. At most two renders per worker are in flight, and
+        entries are written in scroll order; sessions that fail to render are listed in
+        manifest.json instead of aborting the export."""
+        loop = asyncio.get_running_loop()
+        buffer = ZipStreamBuffer()
+        pending: Deque[Tuple[str, asyncio.Future]] = collections.deque()
+        exported: List[str] = []
+        failed: List[Dict[str, str]] = []
+        
+        async def write_next(archive: zipfile.ZipFile):
+            session_id, future = pending.popleft()
+            try:
+                pdf = await future
+            except Exception as e:
+                logging.error(f"Summary export failed for session {session_id}: {str(e)}")
+                failed.append({"session_id": session_id, "error": str(e)})
+                return
+            archive.writestr(archive_name(session_id), pdf)
+            exported.append(session_id)
+        
+        try:
+            # PDFs are already compressed; deflating them again costs CPU for almost nothing.
+            with zipfile.ZipFile(buffer, mode="w", compression=zipfile.ZIP_STORED) as archive:
+                async for sessions in self.qdrant_manager.iter_completed_sessions(since, until, self.batch_size):
+                    for session in sessions:
+                        session_id = session.get("session_id")
+                        future = loop.run_in_executor(
+                            self._pool(), _worker_render, session.get("collected_data", {}), session_id
+                        )
+                        pending.append((session_id, future))
+                        if len(pending) >= self.workers * 2:
+                            await write_next(archive)
+                            yield buffer.drain()
+                
+                while pending:
+                    await write_next(archive)
+                    yield buffer.drain()
+                
+                archive.writestr("manifest.json", json.dumps({
+                    "generated_at": datetime.utcnow().isoformat(),
+                    "since": since.isoformat() if since else None,
+                    "until": until.isoformat() if until else None,
+                    "exported": len(exported),
+                    "failed": failed,
+                    "sessions": exported
+                }, indent=2))
+            yield buffer.drain()
+            logging.info(f"Exported {len(exported)} enrollment summaries ({len(failed)} failed)")
+        finally:
+            # The client may disconnect mid-stream; do not leave its renders queued in the pool.
+            for _, future in pending:
+                future.cancel()
+    
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
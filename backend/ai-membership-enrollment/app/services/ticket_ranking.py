@@ -0,0 +1,45 @@
+from typing import Dict, List, Iterable
+import math
+import re
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+def tokenize(text: str) -> List[str]:
+    # Mirrors Qdrant's word tokenizer with lowercase=True so query terms line up with the text index.
+    return [token for token in TOKEN_PATTERN.findall((text or "").lower()) if len(token) > 1]
+
+def bm25_scores(terms: List[str], documents: Dict[str, List[str]], document_frequencies: Dict[str, int],
+                total_documents: int, k1: float = 1.2, b: float = 0.75) -> Dict[str, float]:
+    """Okapi BM25 for each tokenized document against the query terms.
+    
+    Document frequencies come from the whole collection, while the average document
+    length is taken from the candidates, which is close enough for re-ranking them.
+    """
+    if not documents:
+        return {}
+    average_length = sum(len(tokens) for tokens in documents.values()) / len(documents) or 1.0
+    
+    scores: Dict[str, float] = {}
+    for document_id, tokens in documents.items():
+        frequencies: Dict[str, int] = {}
+        for token in tokens:
+            frequencies[token] = frequencies.get(token, 0) + 1
+        
+        score = 0.0
+        for term in set(terms):
+            frequency = frequencies.get(term, 0)
+            if not frequency:
+                continue
+            document_frequency = document_frequencies.get(term, 0)
+            idf = math.log(1 + (total_documents - document_frequency + 0.5) / (document_frequency + 0.5))
+            score += idf * frequency * (k1 + 1) / (frequency + k1 * (1 - b + b * len(tokens) / average_length))
+        scores[document_id] = score
+    return scores
+
+def reciprocal_rank_fusion(rankings: Iterable[List[str]], weights: Iterable[float], k: int = 60) -> Dict[str, float]:
+    """Fuse ranked ID lists; rank-based, so cosine and BM25 scores need no common scale."""
+    fused: Dict[str, float] = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, document_id in enumerate(ranking):
+            fused[document_id] = fused.get(document_id, 0.0) + weight / (k + rank + 1)
+    return fused
@@ -0,0 +1,124 @@
+from typing import Dict, Any, BinaryIO, Iterator, List
+import codecs
+import csv
+import io
+import json
+
+SUPPORTED_FORMATS = {".json": "json", ".ndjson": "json", ".jsonl": "json", ".csv": "csv"}
+
+class ImportProgress:
+    """Receives pipeline progress callbacks; the default implementation ignores them."""
+    
+    def parsed(self, count: int):
+        pass
+    
+    def embedded(self, count: int):
+        pass
+    
+    def skipped(self, count: int):
+        pass
+    
+    async def committed(self, batch_index: int, stored: int, unchanged: int):
+        """Batch batch_index is complete: `stored` tickets were written, `unchanged` were skipped."""
+        pass
+
+def detect_format(filename: str) -> str:
+    for extension, file_format in SUPPORTED_FORMATS.items():
+        if filename and filename.lower().endswith(extension):
+            return file_format
+    raise ValueError("Unsupported file format. Please upload JSON or CSV files.")
+
+def iter_json_tickets(stream: BinaryIO, chunk_size: int = 1 << 16,
+                      max_record_bytes: int = 8 << 20) -> Iterator[Dict[str, Any]]:
+    """Yield tickets from a JSON array, a single object or NDJSON without loading the whole file.
+    
+    Objects are decoded one at a time with raw_decode; the buffer only ever holds the
+    unparsed tail of the input, so memory stays bounded by the largest single ticket.
+    A record that is still incomplete after max_record_bytes raises ValueError, so a
+    malformed record cannot pull the rest of the file into memory.
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer = ""
+    position = 0
+    bytes_read = 0
+    eof = False
+    
+    def fill() -> bool:
+        nonlocal buffer, position, bytes_read, eof
+        if eof:
+            return False
+        chunk = stream.read(chunk_size)
+        bytes_read += len(chunk)
+        if not chunk:
+            eof = True
+            buffer = buffer[position:] + text_decoder.decode(b"", final=True)
+        else:
+            buffer = buffer[position:] + text_decoder.decode(chunk)
+        position = 0
+        return True
+    
+    def offset() -> int:
+        # Byte offset of `position` in the stream: everything read, less the undecoded and unparsed tail.
+        return bytes_read - len(text_decoder.getstate()[0]) - len(buffer[position:].encode("utf-8"))
+    
+    def skip(characters: str) -> str:
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position] in characters:
+                position += 1
+            if position < len(buffer):
+                return buffer[position]
+            if not fill():
+                return ""
+    
+    whitespace = " \t\r\n"
+    first = skip(whitespace)
+    if not first:
+        return
+    in_array = first == "["
+    if in_array:
+        position += 1
+    
+    while True:
+        next_char = skip(whitespace + ("," if in_array else ""))
+        if not next_char or (in_array and next_char == "]"):
+            return
+        
+        while True:
+            try:
+                ticket, end = decoder.raw_decode(buffer, position)
+                break
+            except json.JSONDecodeError as e:
+                # Characters, not bytes, but never more than the bytes they came from.
+                if len(buffer) - position > max_record_bytes:
+                    raise ValueError(
+                        f"Ticket record at byte {offset()} is malformed or larger than {max_record_bytes} bytes"
+                    ) from e
+                if not fill():
+                    raise ValueError(f"Ticket record at byte {offset()} is malformed: {e.msg}") from e
+        position = end
+        yield ticket
+
+def iter_csv_tickets(stream: BinaryIO) -> Iterator[Dict[str, Any]]:
+    text_stream = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    try:
+        for row in csv.DictReader(text_stream):
+            yield row
+    finally:
+        text_stream.detach()
+
+def iter_ticket_batches(stream: BinaryIO, file_format: str, batch_size: int,
+                        max_record_bytes: int = 8 << 20) -> Iterator[List[Dict[str, Any]]]:
+    if file_format == "csv":
+        tickets = iter_csv_tickets(stream)
+    else:
+        tickets = iter_json_tickets(stream, max_record_bytes=max_record_bytes)
+    batch: List[Dict[str, Any]] = []
+    for ticket in tickets:
+        batch.append(ticket)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -1,57 +1,251 @@
-from fastapi import UploadFile
+from typing import List, Dict, Any, Tuple
+import asyncio
+import hashlib
 import json
-import csv
-from typing import List, Dict, Any
 import logging
+import os
 from app.database.qdrant_client import QdrantManager
 from app.services.openai_service import OpenAIService
-import uuid
+from app.services.pii_service import PIIService
+from app.services.zendesk_import import ImportProgress
+from app.services.ticket_ranking import tokenize, bm25_scores, reciprocal_rank_fusion
+
+# Structural fields that identify, filter or sort tickets; scrubbing them would break
+# dedupe and the payload indexes, and they carry no free-text PII.
+UNSCRUBBED_FIELDS = {"id", "status", "priority", "type", "created_at", "updated_at", "tags"}
 
 class ZendeskService:
-    def __init__(self, qdrant_manager: QdrantManager):
+    def __init__(self, qdrant_manager: QdrantManager, openai_service: OpenAIService = None, pii_service: PIIService = None):
         self.qdrant_manager = qdrant_manager
-        self.openai_service = OpenAIService()
+        self.openai_service = openai_service or OpenAIService()
+        self.scrub_pii = os.getenv("ZENDESK_IMPORT_SCRUB_PII", "false").lower() == "true"
+        self.pii_service = pii_service or (PIIService() if self.scrub_pii else None)
+        self.batch_size = int(os.getenv("ZENDESK_IMPORT_BATCH_SIZE", "100"))
+        self.max_record_bytes = int(os.getenv("ZENDESK_IMPORT_MAX_RECORD_BYTES", str(8 << 20)))
+        self.scrub_concurrency = int(os.getenv("ZENDESK_IMPORT_SCRUB_CONCURRENCY", "2"))
+        self.embed_concurrency = int(os.getenv("ZENDESK_IMPORT_EMBED_CONCURRENCY", "4"))
+        self.upsert_concurrency = int(os.getenv("ZENDESK_IMPORT_UPSERT_CONCURRENCY", "2"))
+        self.search_candidates = int(os.getenv("ZENDESK_SEARCH_CANDIDATES", "50"))
+        self.search_keyword_weight = float(os.getenv("ZENDESK_SEARCH_KEYWORD_WEIGHT", "1.0"))
+        self.keyword_candidates = int(os.getenv("ZENDESK_KEYWORD_CANDIDATES", "500"))
     
-    async def import_datadump(self, file: UploadFile) -> int:
+    async def run_import_pipeline(self, batches, progress: ImportProgress = None, start_batch: int = 0) -> int:
+        """Parse -> prepare -> embed -> upsert with bounded queues between the stages.
+        
+        Parsing reads the upload incrementally in a worker thread, so only a few batches
+        are ever held in memory regardless of the file size. Batches are numbered from
+        start_batch so a resumed import reports the same indexes as the original run.
+        The prepare stage drops unchanged tickets and, with ZENDESK_IMPORT_SCRUB_PII,
+        anonymizes the rest in the PII process pool while earlier batches are embedding.
+        """
+        progress = progress or ImportProgress()
+        prepare_queue: asyncio.Queue = asyncio.Queue(maxsize=self.scrub_concurrency * 2)
+        embed_queue: asyncio.Queue = asyncio.Queue(maxsize=self.embed_concurrency * 2)
+        upsert_queue: asyncio.Queue = asyncio.Queue(maxsize=self.upsert_concurrency * 2)
+        stored = 0
+        
+        async def parse():
+            batch_index = start_batch
+            while True:
+                batch = await asyncio.to_thread(next, batches, None)
+                if batch is None:
+                    break
+                progress.parsed(len(batch))
+                await prepare_queue.put((batch_index, batch))
+                batch_index += 1
+            for _ in range(self.scrub_concurrency):
+                await prepare_queue.put(None)
+        
+        async def prepare():
+            while True:
+                item = await prepare_queue.get()
+                if item is None:
+                    return
+                batch_index, batch = item
+                changed = await self._changed_tickets(batch)
+                if len(changed) < len(batch):
+                    progress.skipped(len(batch) - len(changed))
+                if changed and self.scrub_pii:
+                    # IDs and content hashes were taken from the raw tickets above, so
+                    # re-importing the same export still dedupes after scrubbing.
+                    scrubbed = await self._scrub_tickets([ticket for _, _, ticket in changed])
+                    changed = [
+                        (ticket_id, content_hash, ticket)
+                        for (ticket_id, content_hash, _), ticket in zip(changed, scrubbed)
+                    ]
+                await embed_queue.put((batch_index, len(batch) - len(changed), changed))
+        
+        async def embed():
+            while True:
+                item = await embed_queue.get()
+                if item is None:
+                    return
+                batch_index, unchanged, changed = item
+                embeddings = []
+                if changed:
+                    embeddings = await self.openai_service.get_embeddings_batch(
+                        [self._ticket_text(ticket) for _, _, ticket in changed]
+                    )
+                    progress.embedded(len(changed))
+                await upsert_queue.put((batch_index, unchanged, [
+                    (ticket_id, ticket, embedding, content_hash)
+                    for (ticket_id, content_hash, ticket), embedding in zip(changed, embeddings)
+                ]))
+        
+        async def upsert():
+            nonlocal stored
+            while True:
+                item = await upsert_queue.get()
+                if item is None:
+                    return
+                batch_index, unchanged, tickets = item
+                if tickets:
+                    await self.qdrant_manager.store_zendesk_tickets(tickets)
+                stored += len(tickets)
+                await progress.committed(batch_index, len(tickets), unchanged)
+        
+        async def prepare_stage():
+            await asyncio.gather(*[prepare() for _ in range(self.scrub_concurrency)])
+            for _ in range(self.embed_concurrency):
+                await embed_queue.put(None)
+        
+        async def embed_stage():
+            await asyncio.gather(*[embed() for _ in range(self.embed_concurrency)])
+            for _ in range(self.upsert_concurrency):
+                await upsert_queue.put(None)
+        
         try:
-            content = await file.read()
-            
-            if file.filename.endswith('.json'):
-                data = json.loads(content.decode('utf-8'))
-                tickets = data if isinstance(data, list) else [data]
-            elif file.filename.endswith('.csv'):
-                csv_content = content.decode('utf-8').splitlines()
-                reader = csv.DictReader(csv_content)
-                tickets = list(reader)
-            else:
-                raise ValueError("Unsupported file format. Please upload JSON or CSV files.")
-            
-            imported_count = 0
-            for ticket in tickets:
-                await self._process_ticket(ticket)
-                imported_count += 1
-            
-            logging.info(f"Successfully imported {imported_count} tickets from Zendesk datadump")
-            return imported_count
-            
-        except Exception as e:
-            logging.error(f"Zendesk datadump import error: {str(e)}")
-            raise
+            async with asyncio.TaskGroup() as task_group:
+                task_group.create_task(parse())
+                task_group.create_task(prepare_stage())
+                task_group.create_task(embed_stage())
+                for _ in range(self.upsert_concurrency):
+                    task_group.create_task(upsert())
+        except ExceptionGroup as eg:
+            raise eg.exceptions[0]
+        
+        return stored
+    
+    async def _scrub_tickets(self, tickets: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        free_text = [{key: value for key, value in ticket.items() if key not in UNSCRUBBED_FIELDS} for ticket in tickets]
+        scrubbed = await self.pii_service.strip_pii_batch(free_text)
+        return [
+            {key: cleaned.get(key, value) for key, value in ticket.items()}
+            for ticket, cleaned in zip(tickets, scrubbed)
+        ]
     
-    async def _process_ticket(self, ticket_data: Dict[str, Any]):
-        ticket_text = f"{ticket_data.get('subject', '')} {ticket_data.get('description', '')}"
-        embedding = await self.openai_service.get_embedding(ticket_text)
+    async def _changed_tickets(self, batch: List[Dict[str, Any]]) -> List[Tuple[str, str, Dict[str, Any]]]:
+        """Drop tickets whose stored content hash matches, so unchanged tickets cost nothing."""
+        keyed = []
+        for ticket in batch:
+            self._normalize_tags(ticket)
+            content_hash = self._content_hash(ticket)
+            keyed.append((self._ticket_id(ticket, content_hash), content_hash, ticket))
         
-        ticket_id = ticket_data.get('id', str(uuid.uuid4()))
+        existing_hashes = await self.qdrant_manager.get_zendesk_content_hashes(
+            list({ticket_id for ticket_id, _, _ in keyed})
+        )
+        return [
+            (ticket_id, content_hash, ticket)
+            for ticket_id, content_hash, ticket in keyed
+            if existing_hashes.get(ticket_id) != content_hash
+        ]
+    
+    def _normalize_tags(self, ticket_data: Dict[str, Any]):
+        # CSV exports flatten tags into one string; store a list so the tags index can match them.
+        tags = ticket_data.get("tags")
+        if isinstance(tags, str):
+            ticket_data["tags"] = [tag for tag in tags.replace(",", " ").split() if tag]
+    
+    def _content_hash(self, ticket_data: Dict[str, Any]) -> str:
+        canonical = json.dumps(ticket_data, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+    
+    def _ticket_text(self, ticket_data: Dict[str, Any]) -> str:
+        return f"{ticket_data.get('subject', '')} {ticket_data.get('description', '')}"
+    
+    def _ticket_id(self, ticket_data: Dict[str, Any], content_hash: str = None) -> str:
+        # Tickets without a Zendesk ID are keyed by content so identical rows still collapse.
+        if ticket_data.get('id') not in (None, ""):
+            return str(ticket_data['id'])
+        return f"sha256:{content_hash or self._content_hash(ticket_data)}"
+    
+    async def get_tickets(self, limit: int = 50, cursor: str = None, status: str = None, priority: str = None,
+                          tags: List[str] = None, sort: str = None) -> Dict[str, Any]:
+        (tickets, next_cursor), total = await asyncio.gather(
+            self.qdrant_manager.get_zendesk_tickets(
+                limit=limit, cursor=cursor, status=status, priority=priority, tags=tags, sort=sort
+            ),
+            self.qdrant_manager.count_zendesk_tickets(status=status, priority=priority, tags=tags)
+        )
+        return {
+            "tickets": tickets,
+            "total": total,
+            "total_exact": self.qdrant_manager.count_exact,
+            "next_page_offset": next_cursor
+        }
+    
+    async def search_tickets(self, query: str, limit: int = 10, status: str = None, tags: List[str] = None,
+                             score_threshold: float = None, hnsw_ef: int = None) -> List[Dict[str, Any]]:
+        """Hybrid search: dense top-k and keyword matches, re-scored with BM25 and fused by rank.
+        
+        score_threshold applies to the vector leg only; tickets that clear it or match a
+        query term are candidates, and every candidate gets a BM25 score over its text.
+        Keyword candidates matching every term are fetched before those matching any term.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))[:16]
+        candidate_limit = max(limit, self.search_candidates)
+        
+        async def dense():
+            query_vector = await self.openai_service.get_embedding(query)
+            return await self.qdrant_manager.search_zendesk_tickets(
+                query_vector, limit=candidate_limit, status=status, tags=tags,
+                score_threshold=score_threshold, hnsw_ef=hnsw_ef
+            )
         
-        await self.qdrant_manager.store_zendesk_ticket(
-            ticket_id=str(ticket_id),
-            ticket_data=ticket_data,
-            embedding=embedding
+        async def keyword():
+            if not terms:
+                return [], {}, 0
+            matches, total, *frequencies = await asyncio.gather(
+                self.qdrant_manager.match_zendesk_tickets(
+                    terms, limit=max(limit, self.keyword_candidates), status=status, tags=tags
+                ),
+                self.qdrant_manager.count_zendesk_tickets(),
+                *[self.qdrant_manager.count_zendesk_term(term) for term in terms]
+            )
+            return matches, dict(zip(terms, frequencies)), total
+        
+        dense_hits, (keyword_hits, document_frequencies, total_documents) = await asyncio.gather(dense(), keyword())
+        
+        candidates = {hit["id"]: hit["payload"].get("data", {}) for hit in keyword_hits + dense_hits}
+        vector_scores = {hit["id"]: hit["score"] for hit in dense_hits}
+        keyword_scores = bm25_scores(
+            terms,
+            {point_id: tokenize(self._search_text(ticket)) for point_id, ticket in candidates.items()},
+            document_frequencies,
+            max(total_documents, len(candidates))
+        )
+        
+        keyword_ranking = sorted((point_id for point_id, score in keyword_scores.items() if score > 0),
+                                 key=keyword_scores.get, reverse=True)
+        fused = reciprocal_rank_fusion(
+            [[hit["id"] for hit in dense_hits], keyword_ranking],
+            [1.0, self.search_keyword_weight]
         )
+        ranked = sorted(fused, key=fused.get, reverse=True)[:limit]
+        return [
+            {
+                "ticket": candidates[point_id],
+                "score": fused[point_id],
+                "vector_score": vector_scores.get(point_id),
+                "keyword_score": keyword_scores.get(point_id, 0.0)
+            }
+            for point_id in ranked
+        ]
     
-    async def get_tickets(self, limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
-        return await self.qdrant_manager.get_zendesk_tickets(limit=limit, offset=offset)
+    def _search_text(self, ticket_data: Dict[str, Any]) -> str:
+        tags = ticket_data.get("tags") or []
+        return f"{self._ticket_text(ticket_data)} {' '.join(tags) if isinstance(tags, list) else tags}"
     
     def create_sample_datadump(self) -> List[Dict[str, Any]]:
         return [
@@ -1,12 +1,15 @@
 from langgraph.graph import StateGraph, END
 from langgraph.graph.message import add_messages
-from typing import Dict, Any, List, TypedDict, Annotated
+from typing import Dict, Any, List, Optional, TypedDict, Annotated
+import hashlib
+import json
 import uuid
 from datetime import datetime
 import logging
 from app.services.openai_service import OpenAIService
 from app.services.pii_service import PIIService
-from app.services.pdf_service import PDFService
+from app.services.pdf_service import PDFService, etag_matches
+from app.services.embedding_queue import EmbeddingQueue
 from app.database.qdrant_client import QdrantManager
 from app.schemas.enrollment import ChatResponse
 
@@ -21,11 +24,13 @@ class EnrollmentState(TypedDict):
     response_message: str
 
 class EnrollmentWorkflow:
-    def __init__(self, qdrant_manager: QdrantManager):
+    def __init__(self, qdrant_manager: QdrantManager, openai_service: OpenAIService = None):
         self.qdrant_manager = qdrant_manager
-        self.openai_service = OpenAIService()
+        self.openai_service = openai_service or OpenAIService()
         self.pii_service = PIIService()
         self.pdf_service = PDFService()
+        self.embedding_queue = EmbeddingQueue(qdrant_manager, self.openai_service)
+        self._recording_summaries = set()
         self.workflow = self._create_workflow()
     
     def _create_workflow(self) -> StateGraph:
@@ -76,7 +81,7 @@ class EnrollmentWorkflow:
             session_data = {
                 "session_id": session_id,
                 "user_id": user_id,
-                "messages": [
+                "messages": (existing_session.get("messages", []) if existing_session else []) + [
                     {"role": "user", "content": message, "timestamp": datetime.utcnow().isoformat()},
                     {"role": "assistant", "content": response_message, "timestamp": datetime.utcnow().isoformat()}
                 ],
@@ -88,8 +93,8 @@ class EnrollmentWorkflow:
                 "updated_at": datetime.utcnow().isoformat()
             }
             
-            embedding = await self.openai_service.get_embedding(message)
-            await self.qdrant_manager.store_session_data(session_id, user_id, session_data, embedding)
+            await self.qdrant_manager.store_session_data(session_id, user_id, session_data)
+            self.embedding_queue.submit("session", session_id, message)
             
             return ChatResponse(
                 message=response_message,
@@ -327,26 +332,57 @@ class EnrollmentWorkflow:
             return "validate_profile"
         return "ask_company"
     
-    async def generate_pdf_summary(self, session_id: str) -> str:
+    async def generate_pdf_summary(self, session_id: str, if_none_match: Optional[str] = None) -> Dict[str, Any]:
+        """Return the PDFService artifact for the session, or {"etag", "not_modified": True}
+        when the client's If-None-Match already names the current version. The summary
+        record is written separately by record_summary, after the response."""
         try:
             session_data = await self.qdrant_manager.get_session_data(session_id)
             if not session_data:
                 raise ValueError("Session not found")
             
             collected_data = session_data.get("collected_data", {})
-            pdf_path = self.pdf_service.generate_enrollment_summary(collected_data, session_id)
+            etag = self.pdf_service.summary_etag(collected_data, session_id)
+            if etag_matches(if_none_match, etag):
+                return {"etag": etag, "not_modified": True}
             
+            return await self.pdf_service.render_summary(collected_data, session_id)
+            
+        except Exception as e:
+            logging.error(f"PDF summary generation error: {str(e)}")
+            raise
+    
+    async def record_summary(self, session_id: str):
+        """Embed and store the session's summary point, once per session state.
+        
+        The point ID is derived from the session, and the stored content hash covers the
+        summary text and collected data, so repeated downloads of an unchanged session
+        neither call the embedding API nor write to Qdrant.
+        """
+        # Parallel downloads of one session only need one of them to do the check.
+        if session_id in self._recording_summaries:
+            return
+        self._recording_summaries.add(session_id)
+        try:
+            session_data = await self.qdrant_manager.get_session_data(session_id)
+            if not session_data:
+                return
+            
+            collected_data = session_data.get("collected_data", {})
             summary_text = f"Enrollment summary for {collected_data.get('name', 'Unknown')}"
-            embedding = await self.openai_service.get_embedding(summary_text)
+            content = json.dumps({"summary_text": summary_text, "collected_data": collected_data}, sort_keys=True, default=str)
+            content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+            if await self.qdrant_manager.get_summary_content_hash(session_id) == content_hash:
+                return
             
+            embedding = await self.openai_service.get_embedding(summary_text)
             await self.qdrant_manager.store_summary_data(
                 session_id=session_id,
                 summary_text=summary_text,
-                embedding=embedding
+                embedding=embedding,
+                content_hash=content_hash
             )
-            
-            return pdf_path
-            
         except Exception as e:
-            logging.error(f"PDF summary generation error: {str(e)}")
-            raise
+            logging.error(f"Summary record error: {str(e)}")
+        finally:
+            self._recording_summaries.discard(session_id)
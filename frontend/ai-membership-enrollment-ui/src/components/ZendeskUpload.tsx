@@ -3,7 +3,7 @@ import { Button } from '@/components/ui/button'
 import { Card, CardContent } from '@/components/ui/card'
 import { Progress } from '@/components/ui/progress'
 import { Upload, FileText, CheckCircle, AlertCircle } from 'lucide-react'
-import { apiClient } from '@/services/api'
+import { apiClient, ZendeskImportStatus } from '@/services/api'
 import { useToast } from '@/hooks/use-toast'
 
 export function ZendeskUpload() {
@@ -13,10 +13,24 @@ export function ZendeskUpload() {
     success: boolean
     message: string
     count?: number
+    unchanged?: number
   } | null>(null)
   const fileInputRef = useRef<HTMLInputElement>(null)
   const { toast } = useToast()
 
+  const waitForImport = async (jobId: string): Promise<ZendeskImportStatus> => {
+    while (true) {
+      const status = await apiClient.getZendeskImportStatus(jobId)
+      if (status.file_size > 0) {
+        setUploadProgress(Math.min(Math.round((status.bytes_read / status.file_size) * 100), 99))
+      }
+      if (status.status === 'completed' || status.status === 'failed') {
+        return status
+      }
+      await new Promise(resolve => setTimeout(resolve, 1000))
+    }
+  }
+
   const handleFileSelect = () => {
     fileInputRef.current?.click()
   }
@@ -25,7 +39,7 @@ export function ZendeskUpload() {
     const file = event.target.files?.[0]
     if (!file) return
 
-    if (!file.name.endsWith('.json') && !file.name.endsWith('.csv')) {
+    if (!['.json', '.ndjson', '.jsonl', '.csv'].some(extension => file.name.endsWith(extension))) {
       toast({
         title: "Invalid file type",
         description: "Please upload a JSON or CSV file.",
@@ -39,24 +53,25 @@ export function ZendeskUpload() {
       setUploadProgress(0)
       setUploadResult(null)
 
-      const progressInterval = setInterval(() => {
-        setUploadProgress(prev => Math.min(prev + 10, 90))
-      }, 200)
+      const job = await apiClient.uploadZendeskDatadump(file)
+      const result = await waitForImport(job.job_id)
+
+      if (result.status === 'failed') {
+        throw new Error(result.error || 'Import failed')
+      }
 
-      const result = await apiClient.uploadZendeskDatadump(file)
-      
-      clearInterval(progressInterval)
       setUploadProgress(100)
       
       setUploadResult({
         success: true,
-        message: result.message,
-        count: result.imported_count
+        message: 'Datadump imported successfully',
+        count: result.tickets_stored,
+        unchanged: result.tickets_unchanged
       })
       
       toast({
         title: "Upload successful",
-        description: `Imported ${result.imported_count} tickets successfully.`,
+        description: `Imported ${result.tickets_stored} tickets successfully, ${result.tickets_unchanged} unchanged.`,
       })
     } catch (error) {
       console.error('Upload error:', error)
@@ -102,7 +117,7 @@ export function ZendeskUpload() {
           <input
             ref={fileInputRef}
             type="file"
-            accept=".json,.csv"
+            accept=".json,.ndjson,.jsonl,.csv"
             onChange={handleFileUpload}
             className="hidden"
           />
@@ -142,7 +157,7 @@ export function ZendeskUpload() {
                 </p>
                 <p className={`text-sm ${uploadResult.success ? 'text-green-600' : 'text-red-600'}`}>
                   {uploadResult.message}
-                  {uploadResult.count && ` (${uploadResult.count} tickets imported)`}
+                  {uploadResult.count !== undefined && ` (${uploadResult.count} tickets imported, ${uploadResult.unchanged ?? 0} unchanged)`}
                 </p>
               </div>
             </div>
@@ -60,6 +60,33 @@ export interface ZendeskTicketsResponse {
     tags: string[]
   }>
   total: number
+  total_exact: boolean
+  next_page_offset: string | null
+}
+
+export interface ZendeskImportJob {
+  message: string
+  job_id: string
+  status: string
+}
+
+export interface ZendeskImportStatus {
+  job_id: string
+  filename: string
+  status: 'queued' | 'running' | 'completed' | 'failed'
+  tickets_parsed: number
+  tickets_embedded: number
+  tickets_unchanged: number
+  tickets_stored: number
+  bytes_read: number
+  file_size: number
+  committed_batches: number
+  elapsed_seconds: number | null
+  throughput_per_second: number | null
+  eta_seconds: number | null
+  error: string | null
+  created_at: string
+  finished_at: string | null
 }
 
 export const apiClient = {
@@ -85,7 +112,7 @@ export const apiClient = {
     return response.data
   },
 
-  async uploadZendeskDatadump(file: File): Promise<{ message: string; imported_count: number }> {
+  async uploadZendeskDatadump(file: File): Promise<ZendeskImportJob> {
     const formData = new FormData()
     formData.append('file', file)
     
@@ -97,9 +124,14 @@ export const apiClient = {
     return response.data
   },
 
-  async getZendeskTickets(limit = 50, offset = 0): Promise<ZendeskTicketsResponse> {
+  async getZendeskImportStatus(jobId: string): Promise<ZendeskImportStatus> {
+    const response = await api.get(`/api/zendesk/import/${jobId}`)
+    return response.data
+  },
+
+  async getZendeskTickets(limit = 50, cursor?: string): Promise<ZendeskTicketsResponse> {
     const response = await api.get('/api/zendesk/tickets', {
-      params: { limit, offset },
+      params: { limit, cursor },
     })
     return response.data
   },